@@ -1,18 +1,35 @@
 # app.py
 import streamlit as st
-import pdfplumber
-import json
 import pandas as pd
-from typing import Any
+from typing import Optional
 from datetime import datetime
 import uuid
 from supabase import create_client, Client
 import os
+import subprocess
+import sys
+import threading
+import time
 from pathlib import Path
 
-# Create upload directory
-UPLOAD_DIR = Path("uploaded")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Number of processes used to extract pages (1 = serial, in the Streamlit process)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "1"))
+# Processes used for multi-file / zip batch uploads
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+# Only extract the pages/tables mapping_v1 reads; raw JSON is then partial (metadata.partial)
+EXTRACT_MAPPED_TABLES_ONLY = os.getenv("EXTRACT_MAPPED_TABLES_ONLY", "0") == "1"
+# Emit numbers and ISO dates for numeric / date columns instead of strings (metadata.typed_cells)
+TYPED_CELLS = os.getenv("TYPED_CELLS", "0") == "1"
+# Reuse detected table geometry for pages whose ruling layout was seen before
+USE_TABLE_TEMPLATES = os.getenv("USE_TABLE_TEMPLATES", "1") == "1"
+# Single uploads become durable jobs processed by worker processes (0 = extract in the Streamlit process)
+USE_JOB_QUEUE = os.getenv("USE_JOB_QUEUE", "1") == "1"
+# Worker processes the app starts itself (0 = run `python worker.py` separately)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = 1.0
+# Uploaded PDFs beyond this size are moved to the archive directory, least recently used first
+UPLOAD_STORE_MAX_MB = int(os.getenv("UPLOAD_STORE_MAX_MB", "2048"))
+UPLOAD_ARCHIVE_DIR = os.getenv("UPLOAD_ARCHIVE_DIR") or None  # default: uploaded/archive
 
 
 # -----------------------------
@@ -23,269 +40,146 @@ SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # Import mapping function (make sure mapping_v1.py has run_mapping(input_json: dict) -> dict)
-from mapping_v1 import run_mapping
+from mapping_v1 import new_cell_index, required_tables, run_mapping
+from extractor import EXTRACTION_TYPES, ExtractionOptions, extract_document
+from result_cache import ResultCache, cache_variant
+from profiling import NULL_PROFILER, StageProfiler
+from history_store import (
+    DEFAULT_PAGE_SIZE, HistoryRecord, enqueue_history_records, fetch_history_page, fetch_record_json,
+    live_pdf_hashes, pdf_hash_in_use,
+)
+from download_cache import pdf_cache
+from write_queue import WriteBehindQueue
+from serialization import dumps, dumps_pretty
+from batch import expand_uploads, mapped_zip, run_batch
+from jobs import Job, JobStore
+from table_templates import TemplateRegistry
+from upload_store import UPLOAD_DIR, UploadStore
 
-# -----------------------------
-# Helper functions (from your existing app)
-# -----------------------------
-def normalize_color(color) -> tuple:
-    if not color or not isinstance(color, (list, tuple)):
-        return (1.0, 1.0, 1.0)
-    if len(color) == 1:
-        gray = float(color[0])
-        return (gray, gray, gray)
-    elif len(color) == 3:
-        return (float(color[0]), float(color[1]), float(color[2]))
-    elif len(color) == 4:
-        c, m, y, k = float(color[0]), float(color[1]), float(color[2]), float(color[3])
-        r = (1 - c) * (1 - k)
-        g = (1 - m) * (1 - k)
-        b = (1 - y) * (1 - k)
-        return (r, g, b)
-    return (1.0, 1.0, 1.0)
-
-def is_highlighted_color(color) -> bool:
-    r, g, b = normalize_color(color)
-    is_white = r > 0.85 and g > 0.85 and b > 0.85
-    is_black = r < 0.15 and g < 0.15 and b < 0.15
-    return not is_white and not is_black
-
-def detect_header_row_visual(page, table_obj) -> int:
-    if not table_obj:
-        return -1
-    try:
-        table_bbox = table_obj.bbox
-        x0, top, x1, bottom = table_bbox
-        rects = page.within_bbox((x0, top, x1, bottom)).rects
-        chars = page.within_bbox((x0, top, x1, bottom)).chars
-        if not rects or not chars:
-            return -1
-        table_rows = table_obj.rows
-        if not table_rows:
-            return -1
-        row_boundaries = []
-        for row in table_rows[:5]:
-            if row.cells:
-                cells = [c for c in row.cells if c]
-                if cells:
-                    first_cell = cells[0]
-                    if hasattr(first_cell, 'bbox'):
-                        _, row_top, _, row_bottom = first_cell.bbox
-                        row_boundaries.append((row_top, row_bottom))
-                    elif isinstance(first_cell, (list, tuple)) and len(first_cell) >= 4:
-                        row_top = first_cell[1]
-                        row_bottom = first_cell[3]
-                        row_boundaries.append((row_top, row_bottom))
-        if not row_boundaries:
-            return -1
-        row_highlights: dict[int, int] = {}
-        for rect in rects:
-            rect_top = rect.get('top', 0)
-            rect_bottom = rect.get('bottom', 0)
-            rect_mid = (rect_top + rect_bottom) / 2
-            for row_idx, (r_top, r_bottom) in enumerate(row_boundaries):
-                if r_top <= rect_mid <= r_bottom:
-                    fill_color = rect.get('non_stroking_color')
-                    if fill_color and is_highlighted_color(fill_color):
-                        row_highlights[row_idx] = row_highlights.get(row_idx, 0) + 1
-                    break
-        for row_idx in sorted(row_highlights.keys()):
-            if row_highlights[row_idx] >= 1:
-                r_top, r_bottom = row_boundaries[row_idx]
-                has_text = any(r_top <= char.get('top', 0) <= r_bottom for char in chars)
-                if has_text:
-                    return row_idx
-    except Exception:
-        pass
-    return -1
-
-def is_likely_header_row(row) -> bool:
-    if not row:
-        return False
-    non_empty_cells = [cell for cell in row if cell is not None and str(cell).strip()]
-    if len(non_empty_cells) < len(row) * 0.5:
-        return False
-    text_cells = 0
-    short_text_cells = 0
-    for cell in non_empty_cells:
-        cell_str = str(cell).strip()
-        is_number = cell_str.replace('.', '').replace('-', '').replace(',', '').replace('$', '').replace('%', '').isdigit()
-        if not is_number:
-            text_cells += 1
-            if len(cell_str.split()) <= 5:
-                short_text_cells += 1
-    has_mostly_text = text_cells >= len(non_empty_cells) * 0.7 if non_empty_cells else False
-    has_short_text = short_text_cells >= len(non_empty_cells) * 0.6 if non_empty_cells else False
-    return has_mostly_text and has_short_text
-
-def detect_multirow_headers(table: list, start_idx: int) -> tuple[int, list[str]]:
-    if start_idx >= len(table):
-        return start_idx, table[start_idx] if start_idx < len(table) else []
-    potential_header_rows = []
-    max_header_rows = min(3, len(table) - start_idx)
-    for i in range(max_header_rows):
-        row = table[start_idx + i]
-        if is_likely_header_row(row):
-            potential_header_rows.append(row)
-        else:
-            break
-    if len(potential_header_rows) <= 1:
-        return start_idx, table[start_idx] if start_idx < len(table) else []
-    num_cols = max(len(row) for row in potential_header_rows)
-    consolidated_headers = []
-    for col_idx in range(num_cols):
-        header_parts = []
-        for row in potential_header_rows:
-            if col_idx < len(row) and row[col_idx] is not None:
-                cell_str = str(row[col_idx]).strip()
-                if cell_str and cell_str not in header_parts:
-                    header_parts.append(cell_str)
-        if header_parts:
-            consolidated_headers.append(' '.join(header_parts))
-        else:
-            consolidated_headers.append(None)
-    return start_idx + len(potential_header_rows) - 1, consolidated_headers
-
-def detect_header_row(table: list, page=None, table_obj=None) -> int:
-    if not table or len(table) == 0:
-        return 0
-    if page and table_obj:
-        visual_header = detect_header_row_visual(page, table_obj)
-        if visual_header >= 0 and visual_header < len(table):
-            candidate_row = table[visual_header]
-            if is_likely_header_row(candidate_row):
-                return visual_header
-    max_rows_to_check = min(5, len(table))
-    for idx, row in enumerate(table[:max_rows_to_check]):
-        if is_likely_header_row(row):
-            return idx
-    return 0
-
-def infer_column_types(data_rows: list[list], num_cols: int) -> list[str]:
-    column_types = ['text'] * num_cols
-    for col_idx in range(num_cols):
-        sample_values = []
-        for row in data_rows[:min(10, len(data_rows))]:
-            if col_idx < len(row) and row[col_idx] is not None:
-                val = str(row[col_idx]).strip()
-                if val:
-                    sample_values.append(val)
-        if not sample_values:
-            continue
-        numeric_count = 0
-        date_count = 0
-        for val in sample_values:
-            clean_val = val.replace(',', '').replace('$', '').replace('%', '').replace(' ', '')
-            if clean_val.replace('.', '').replace('-', '').isdigit():
-                numeric_count += 1
-            elif '/' in val or '-' in val:
-                parts = val.replace('/', '-').split('-')
-                if len(parts) >= 2 and all(p.isdigit() for p in parts):
-                    date_count += 1
-        if numeric_count >= len(sample_values) * 0.7:
-            column_types[col_idx] = 'numeric'
-        elif date_count >= len(sample_values) * 0.7:
-            column_types[col_idx] = 'date'
-    return column_types
-
-def clean_table_data(table: list, page=None, table_obj=None) -> tuple[list[str], list[list]]:
-    if not table or len(table) == 0:
-        return [], []
-    header_idx = detect_header_row(table, page, table_obj)
-    final_header_idx, raw_headers = detect_multirow_headers(table, header_idx)
-    all_data_rows = table[final_header_idx + 1:] if final_header_idx + 1 < len(table) else []
-    data_rows = []
-    for row in all_data_rows:
-        if row and any(cell is not None and str(cell).strip() for cell in row):
-            data_rows.append(row)
-    clean_headers = []
-    header_counts: dict[str, int] = {}
-    for i, header in enumerate(raw_headers):
-        if header is None or str(header).strip() == '':
-            clean_header = f"Column_{i+1}"
+result_cache = ResultCache()
+upload_store = UploadStore(UPLOAD_DIR, UPLOAD_ARCHIVE_DIR, UPLOAD_STORE_MAX_MB * 1024 * 1024)
+table_templates = TemplateRegistry() if USE_TABLE_TEMPLATES else None
+
+
+@st.cache_resource
+def get_write_queue() -> WriteBehindQueue:
+    # One durable queue + drain thread per server process, shared by all sessions
+    return WriteBehindQueue(supabase).start()
+
+
+write_queue = get_write_queue()
+job_store = JobStore()
+
+
+@st.cache_resource
+def start_job_workers() -> Optional[subprocess.Popen]:
+    # One worker pool per server process; the workers exit when the server does
+    if not USE_JOB_QUEUE or JOB_WORKERS <= 0:
+        return None
+    return subprocess.Popen([
+        sys.executable, str(Path(__file__).with_name("worker.py")),
+        "--processes", str(JOB_WORKERS),
+        "--parent-pid", str(os.getpid()),
+    ])
+
+
+start_job_workers()
+
+
+def queue_history_records(records: list[HistoryRecord]) -> None:
+    """Queue (filename, raw_json, mapped_json, timings, pdf_hash) records as one bulk history insert."""
+    enqueue_history_records(write_queue, records)
+
+
+def collect_upload_garbage() -> None:
+    """Delete stored PDFs no live history row references, in the background."""
+    def run() -> None:
+        try:
+            upload_store.collect_garbage(live_pdf_hashes(supabase))
+        except Exception:
+            pass  # retried after the next delete; `python upload_store.py gc` does the same
+    threading.Thread(target=run, daemon=True).start()
+
+
+def wait_for_job(job_id: str) -> Optional[Job]:
+    """Return the finished job (None if unknown); otherwise show its status and rerun shortly."""
+    job = job_store.get(job_id)
+    if job is None or job.finished:
+        return job
+    if job.status == "queued":
+        st.info(f"⏳ {job.filename} is queued — {job_store.queue_position(job)} job(s) ahead.")
+    else:
+        st.info(f"⚙️ Extracting {job.filename}... ({time.time() - job.started_at:.0f}s)")
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
+
+
+def render_result(filename: str, all_data: dict, mapped_json_obj: dict, profiler: StageProfiler = NULL_PROFILER) -> None:
+    """Split view of the mapped data plus raw / mapped JSON downloads."""
+    if not all_data["pages"]:
+        st.warning("No structured data found in the PDF.")
+    # Each payload is encoded once; the pretty view is only built where it is displayed
+    with profiler.stage("json_dumps"):
+        compact_raw_json = dumps(all_data)
+        compact_mapped_json = dumps(mapped_json_obj)
+
+    # Display split view: left - extracted preview, right - mapped JSON
+    left_col, right_col = st.columns(2)
+
+    with left_col:
+        st.subheader("📘 Mapped Data (Key → Value Table)")
+
+        if mapped_json_obj:
+            # Convert mapped JSON into key-value table
+            mapped_items = [{"Key": k, "Value": v} for k, v in mapped_json_obj.items()]
+            df_mapped = pd.DataFrame(mapped_items)
+
+            st.dataframe(df_mapped, use_container_width=True)
         else:
-            clean_header = str(header).strip()
-            clean_header = clean_header.replace('\n', ' ').replace('\r', ' ')
-            clean_header = ' '.join(clean_header.split())
-        if clean_header in header_counts:
-            header_counts[clean_header] += 1
-            clean_header = f"{clean_header}_{header_counts[clean_header]}"
+            st.info("No mapped data available.")
+
+    with right_col:
+        st.subheader("🔄 Mapped JSON (mapping_v1 output)")
+        if mapped_json_obj:
+            st.code(dumps_pretty(mapped_json_obj), language="json", line_numbers=True)
         else:
-            header_counts[clean_header] = 1
-        clean_headers.append(clean_header)
-    if not clean_headers:
-        return [], data_rows
-    expected_cols = len(clean_headers)
-    normalized_rows = []
-    for row in data_rows:
-        if not row:
-            continue
-        if not any(cell is not None and str(cell).strip() for cell in row):
-            continue
-        current_row = list(row)
-        if len(current_row) < expected_cols:
-            current_row = current_row + [None] * (expected_cols - len(current_row))
-        elif len(current_row) > expected_cols:
-            current_row = current_row[:expected_cols]
-        cleaned_row = []
-        for cell in current_row:
-            if cell is None:
-                cleaned_row.append(None)
-            else:
-                cleaned_cell = str(cell).strip()
-                cleaned_cell = cleaned_cell.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-                cleaned_cell = ' '.join(cleaned_cell.split())
-                cleaned_row.append(cleaned_cell if cleaned_cell else None)
-        normalized_rows.append(cleaned_row)
-    if normalized_rows and expected_cols > 0:
-        column_types = infer_column_types(normalized_rows, expected_cols)
-        validated_rows = []
-        for row in normalized_rows:
-            row_looks_like_header = is_likely_header_row(row)
-            if row_looks_like_header:
-                continue
-            validated_row = []
-            for col_idx in range(expected_cols):
-                cell = row[col_idx] if col_idx < len(row) else None
-                col_type = column_types[col_idx] if col_idx < len(column_types) else 'text'
-                if cell is None or str(cell).strip() == '':
-                    validated_row.append(cell)
-                    continue
-                cell_str = str(cell).strip()
-                if col_type == 'numeric':
-                    clean_val = cell_str.replace(',', '').replace('$', '').replace('%', '').replace(' ', '')
-                    if not clean_val.replace('.', '').replace('-', '').isdigit():
-                        validated_row.append(None)
-                    else:
-                        validated_row.append(cell)
-                elif col_type == 'date':
-                    parts = cell_str.replace('/', '-').split('-')
-                    if len(parts) >= 2 and all(p.strip().isdigit() for p in parts if p.strip()):
-                        validated_row.append(cell)
-                    else:
-                        validated_row.append(None)
-                else:
-                    validated_row.append(cell)
-            if any(cell is not None and str(cell).strip() for cell in validated_row):
-                validated_rows.append(validated_row)
-        normalized_rows = validated_rows if validated_rows else normalized_rows
-    return clean_headers, normalized_rows
-
-def filter_null_values(data: list[dict]) -> list[dict]:
-    filtered_data = []
-    for record in data:
-        filtered_record = {}
-        for k, v in record.items():
-            if v is None:
-                continue
-            if pd.isna(v):
-                continue
-            if isinstance(v, str) and str(v).strip() == '':
-                continue
-            filtered_record[k] = v
-        if filtered_record:
-            filtered_data.append(filtered_record)
-    return filtered_data
+            st.info("Mapping returned empty result or failed. You can still download raw JSON below.")
+
+    st.divider()
+
+    # Downloads
+    col1, col2, col3 = st.columns([1,1,2])
+    with col1:
+        st.download_button(
+            label="📥 Download Raw JSON",
+            data=compact_raw_json,
+            file_name=f"{filename.rsplit('.',1)[0]}.json",
+            mime="application/json",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            label="📥 Download Mapped JSON",
+            data=compact_mapped_json,
+            file_name=f"{filename.rsplit('.',1)[0]}_mapped.json",
+            mime="application/json",
+            use_container_width=True
+        )
+    with col3:
+        st.info(f"Pages with data: {len(all_data['pages'])} | Tables extracted: {sum(len(p.get('tables', [])) for p in all_data['pages'])}")
+
+
+def render_timings(timings: Optional[dict]) -> None:
+    if not timings:
+        return
+    with st.expander(f"⏱️ Timing breakdown — {timings['total_seconds']:.2f}s total"):
+        st.dataframe(
+            pd.DataFrame(
+                [{"Stage": name, "Seconds": seconds} for name, seconds in timings["stages"].items()]
+            ),
+            use_container_width=True,
+        )
+        st.caption(" | ".join(f"{name}: {n}" for name, n in timings["counts"].items()))
 
 # -----------------------------
 # Streamlit app UI
@@ -318,11 +212,35 @@ if 'uploaded_once' not in st.session_state:
     st.session_state['uploaded_once'] = False
 if 'last_uploaded_filename' not in st.session_state:
     st.session_state['last_uploaded_filename'] = None
+# Extraction job of the current single upload (also kept in the URL as ?job= for reconnects)
+if 'upload_job_id' not in st.session_state:
+    st.session_state['upload_job_id'] = None
+if 'saved_upload_id' not in st.session_state:
+    st.session_state['saved_upload_id'] = None
+    st.session_state['saved_upload_hash'] = None
 
 # Initialize session state history (keeps UI history for session; DB holds full history)
 if 'history' not in st.session_state:
     st.session_state['history'] = []
 
+# Batch uploads: identity of the processed file set, per-file results and the mapped-JSON zip
+if 'batch_signature' not in st.session_state:
+    st.session_state['batch_signature'] = None
+if 'batch_results' not in st.session_state:
+    st.session_state['batch_results'] = []
+if 'batch_zip' not in st.session_state:
+    st.session_state['batch_zip'] = None
+
+# History pagination: stack of keyset cursors, one per page visited (None = first page)
+if 'history_cursors' not in st.session_state:
+    st.session_state['history_cursors'] = [None]
+# Mapped JSON fetched on demand for a single history row: (record id, json string)
+if 'history_mapped_download' not in st.session_state:
+    st.session_state['history_mapped_download'] = None
+# History row whose stored PDF the user asked to download (bytes are read only for this row)
+if 'history_pdf_download' not in st.session_state:
+    st.session_state['history_pdf_download'] = None
+
 tabs = st.tabs(["Upload", "History"])
 
 # -----------------------------
@@ -330,161 +248,247 @@ tabs = st.tabs(["Upload", "History"])
 # -----------------------------
 with tabs[0]:
     st.header("Upload PDF")
-    uploaded_file = st.file_uploader("Choose a PDF file", type=["pdf"], help="Upload a PDF to extract and map")
+    uploaded_files = st.file_uploader(
+        "Choose PDF files",
+        type=["pdf", "zip"],
+        accept_multiple_files=True,
+        help="Upload a PDF to extract and map, or several PDFs / a zip of PDFs to process as a batch"
+    ) or []
+    # A single PDF keeps the detailed single-file view; anything else is a batch
+    if len(uploaded_files) == 1 and uploaded_files[0].name.lower().endswith(".pdf"):
+        uploaded_file = uploaded_files[0]
+        batch_files = []
+    else:
+        uploaded_file = None
+        batch_files = uploaded_files
 
     saved_pdf_path = None
     if uploaded_file:
-        saved_pdf_path = UPLOAD_DIR / uploaded_file.name
-        with open(saved_pdf_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # The stored blob is the one copy extraction, workers and downloads read;
+        # it is written (and hashed) once per upload, not on every rerun
+        saved_hash = st.session_state['saved_upload_hash']
+        if st.session_state['saved_upload_id'] != uploaded_file.file_id or upload_store.locate(saved_hash) is None:
+            saved_hash, saved_pdf_path = upload_store.put(uploaded_file)
+            st.session_state['saved_upload_hash'] = saved_hash
+            st.session_state['saved_upload_id'] = uploaded_file.file_id
+        else:
+            saved_pdf_path = upload_store.restore(saved_hash)
 
-    # extraction_type = st.radio("Extraction type:", options=["Tables", "Text", "Both"], horizontal=True)
-    extraction_type = "Tables"
+    extraction_type = st.radio(
+        "Extraction type:",
+        options=list(EXTRACTION_TYPES),
+        horizontal=True,
+        help="Combined adds the page text outside the tables, from the same pass as the tables.",
+    )
 
     # Reset the uploaded_once flag only when a new file is uploaded (filename changed)
+    # or the extraction type changes
     if uploaded_file:
-        if st.session_state.get('last_uploaded_filename') != uploaded_file.name:
+        if (st.session_state.get('last_uploaded_filename') != uploaded_file.name
+                or st.session_state.get('last_extraction_type') != extraction_type):
             st.session_state['last_uploaded_filename'] = uploaded_file.name
+            st.session_state['last_extraction_type'] = extraction_type
             st.session_state['uploaded_once'] = False
+            st.session_state['upload_job_id'] = None
 
     if uploaded_file is not None and not st.session_state['uploaded_once']:
         try:
-            with pdfplumber.open(uploaded_file) as pdf:
-                total_pages = len(pdf.pages)
-                st.success(f"✅ PDF loaded — {total_pages} page(s).")
-                all_data: dict[str, Any] = {
-                    "metadata": {
-                        "filename": uploaded_file.name,
-                        "total_pages": total_pages
-                    },
-                    "pages": []
-                }
-
+            # Wall time and counts for each stage, shown below and stored with the record
+            profiler = StageProfiler()
+            job = None
+            job_id = st.session_state['upload_job_id']
+
+            # Re-uploads of the same bytes reuse the stored result without opening the PDF
+            cached = None
+            # Only "Tables" extraction can skip pages and tables
+            selection = required_tables() if EXTRACT_MAPPED_TABLES_ONLY and extraction_type == "Tables" else None
+            if job_id is None:
+                with profiler.stage("cache_lookup"):
+                    cache_key = result_cache.key_for_hash(
+                        st.session_state['saved_upload_hash'],
+                        cache_variant(selection is not None, TYPED_CELLS, extraction_type),
+                    )
+                    cached = result_cache.get(cache_key)
+                profiler.count("cache_hit", 1 if cached else 0)
+            if cached:
+                all_data, mapped_json_obj = cached
+                all_data["metadata"]["filename"] = uploaded_file.name
+                total_pages = all_data["metadata"]["total_pages"]
+                st.success(f"✅ PDF loaded — {total_pages} page(s). ⚡ Cache hit: reused stored extraction and mapping.")
+            elif USE_JOB_QUEUE:
+                if job_id is None:
+                    job_id = job_store.submit(
+                        cache_key,
+                        uploaded_file.name,
+                        saved_pdf_path,
+                        {
+                            "extraction_type": extraction_type,
+                            "selection": selection,
+                            "templates": USE_TABLE_TEMPLATES,
+                            "typed_cells": TYPED_CELLS,
+                            "pdf_hash": st.session_state['saved_upload_hash'],
+                        },
+                    ).id
+                    st.session_state['upload_job_id'] = job_id
+                    # A reconnecting browser finds the job through the URL
+                    st.query_params["job"] = job_id
+                job = wait_for_job(job_id)
+                result = job_store.result(job_id) if job is not None else None
+                if result is None:
+                    # Let the next run submit a fresh job
+                    st.session_state['upload_job_id'] = None
+                    raise RuntimeError(job.error if job is not None and job.error else "extraction job was lost")
+                all_data, mapped_json_obj = result.raw_json, result.mapped_json
+                all_data["metadata"]["filename"] = uploaded_file.name
+                total_pages = all_data["metadata"]["total_pages"]
+                st.success(f"✅ PDF loaded — {total_pages} page(s). Extracted and mapped by a background worker.")
+            else:
                 progress_text = st.empty()
-                for page_num, page in enumerate(pdf.pages, start=1):
+
+                def show_progress(page_num: int, total_pages: int) -> None:
                     progress_text.text(f"Processing page {page_num} / {total_pages}...")
-                    page_data: dict[str, Any] = {"page_number": page_num}
-
-                    if extraction_type in ["Tables", "Both"]:
-                        table_settings = page.find_tables()
-                        if table_settings:
-                            page_data["tables"] = []
-                            for table_idx, table_obj in enumerate(table_settings):
-                                try:
-                                    table = table_obj.extract()
-                                    if table and len(table) > 0:
-                                        clean_headers, normalized_rows = clean_table_data(table, page, table_obj)
-                                        if clean_headers and normalized_rows:
-                                            df = pd.DataFrame(normalized_rows, columns=clean_headers)  # type: ignore
-                                            raw_data = df.to_dict(orient="records")
-                                            filtered_data = filter_null_values(raw_data)
-                                            if filtered_data:
-                                                page_data["tables"].append({
-                                                    "table_number": table_idx + 1,
-                                                    "data": filtered_data
-                                                })
-                                        elif normalized_rows:
-                                            df = pd.DataFrame(normalized_rows)
-                                            raw_data = df.to_dict(orient="records")
-                                            filtered_data = filter_null_values(raw_data)
-                                            if filtered_data:
-                                                page_data["tables"].append({
-                                                    "table_number": table_idx + 1,
-                                                    "data": filtered_data
-                                                })
-                                except Exception:
-                                    pass
-                    if extraction_type in ["Text", "Both"]:
-                        text = page.extract_text()
-                        if text:
-                            page_data["text"] = text
-                    if len(page_data) > 1:
-                        all_data["pages"].append(page_data)
-                progress_text.empty()
 
-                if not all_data["pages"]:
-                    st.warning("No structured data found in the PDF.")
-                # Prepare JSON strings
-                raw_json_obj = all_data
-                raw_json_str = json.dumps(raw_json_obj, indent=2, ensure_ascii=False)
-                compact_raw_json = json.dumps(raw_json_obj, ensure_ascii=False)
+                cell_index = new_cell_index()
+                all_data = extract_document(
+                    saved_pdf_path,
+                    ExtractionOptions(
+                        extraction_type=extraction_type,
+                        filename=uploaded_file.name,
+                        workers=EXTRACTION_WORKERS,
+                        selection=selection,
+                        profiler=profiler,
+                        templates=table_templates,
+                        typed_cells=TYPED_CELLS,
+                        cell_index=cell_index,
+                    ),
+                    progress=show_progress,
+                )
+                progress_text.empty()
+                total_pages = all_data["metadata"]["total_pages"]
+                st.success(f"✅ PDF loaded — {total_pages} page(s). Cache miss: extracted and mapped.")
 
                 # Run mapping (call to mapping_v1.run_mapping)
                 mapped_json_obj = {}
                 try:
-                    with st.spinner("Running mapping_v1 on extracted JSON..."):
-                        mapped_json_obj = run_mapping(raw_json_obj) or {}
+                    with st.spinner("Running mapping_v1 on extracted JSON..."), profiler.stage("run_mapping"):
+                        mapped_json_obj = run_mapping(all_data, cell_index) or {}
                 except Exception as e:
                     st.error(f"Mapping function raised an error: {e}")
                     mapped_json_obj = {}
+                else:
+                    result_cache.put(cache_key, all_data, mapped_json_obj)
+
+            render_result(uploaded_file.name, all_data, mapped_json_obj, profiler)
+
+            if job is None:
+                # Save record to Supabase (insert once per upload) via the write-behind queue
+                with profiler.stage("queue_insert"):
+                    # Timings cover everything up to the insert itself
+                    queue_history_records([(
+                        uploaded_file.name, all_data, mapped_json_obj, profiler.to_dict(),
+                        st.session_state['saved_upload_hash'],
+                    )])
+                timings = profiler.to_dict()
+            else:
+                # The worker queued the history record when it finished the job
+                timings = job.timings
 
-                mapped_json_str = json.dumps(mapped_json_obj, indent=2, ensure_ascii=False)
-                compact_mapped_json = json.dumps(mapped_json_obj, ensure_ascii=False)
-
-                # Display split view: left - extracted preview, right - mapped JSON
-                left_col, right_col = st.columns(2)
-
-                with left_col:
-                    st.subheader("📘 Mapped Data (Key → Value Table)")
-
-                    if mapped_json_obj:
-                        # Convert mapped JSON into key-value table
-                        mapped_items = [{"Key": k, "Value": v} for k, v in mapped_json_obj.items()]
-                        df_mapped = pd.DataFrame(mapped_items)
-
-                        st.dataframe(df_mapped, use_container_width=True)
-                    else:
-                        st.info("No mapped data available.")
-
-                with right_col:
-                    st.subheader("🔄 Mapped JSON (mapping_v1 output)")
-                    if mapped_json_obj:
-                        st.code(mapped_json_str, language="json", line_numbers=True)
-                    else:
-                        st.info("Mapping returned empty result or failed. You can still download raw JSON below.")
-
-                st.divider()
-
-                # Downloads and save to history
-                col1, col2, col3 = st.columns([1,1,2])
-                with col1:
-                    st.download_button(
-                        label="📥 Download Raw JSON",
-                        data=compact_raw_json,
-                        file_name=f"{uploaded_file.name.rsplit('.',1)[0]}.json",
-                        mime="application/json",
-                        use_container_width=True
-                    )
-                with col2:
-                    st.download_button(
-                        label="📥 Download Mapped JSON",
-                        data=compact_mapped_json,
-                        file_name=f"{uploaded_file.name.rsplit('.',1)[0]}_mapped.json",
-                        mime="application/json",
-                        use_container_width=True
-                    )
-                with col3:
-                    st.info(f"Pages with data: {len(all_data['pages'])} | Tables extracted: {sum(len(p.get('tables', [])) for p in all_data['pages'])}")
-
-                # Save record to Supabase (insert once per upload)
-                with st.spinner("Saving record to Supabase..."):
-                    supabase.table("pdf_history").insert({
-                        "filename": uploaded_file.name,
-                        "raw_json": raw_json_obj,
-                        "mapped_json": mapped_json_obj,
-                        "page_count": len(raw_json_obj.get("pages", [])),
-                        "table_count": sum(len(p.get("tables", [])) for p in raw_json_obj.get("pages", [])),
-                        "mapped_keys": len(mapped_json_obj.keys()),
-                        "is_deleted": False
-                    }).execute()
-
-                # Mark as processed so subsequent reruns (downloads, clicks) won't insert again
-                st.session_state['uploaded_once'] = True
-                st.success("Saved to History (visible in the History tab).")
+            # Mark as processed so subsequent reruns (downloads, clicks) won't insert again
+            st.session_state['uploaded_once'] = True
+            st.success("Queued for History — it will appear in the History tab once saved.")
+            render_timings(timings)
 
         except Exception as e:
             st.error(f"❌ Error processing PDF: {e}")
 
+    elif uploaded_file is None and not batch_files and st.query_params.get("job"):
+        # Reconnected (or reloaded) page: show the last job's result instead of extracting again
+        job = wait_for_job(st.query_params["job"])
+        result = job_store.result(job.id) if job is not None else None
+        if job is None:
+            del st.query_params["job"]
+        elif result is None:
+            st.error(f"❌ Error processing PDF {job.filename}: {job.error or 'result no longer available'}")
+        else:
+            st.success(f"✅ Result of your last upload, {job.filename} — it has been queued for History.")
+            render_result(job.filename, result.raw_json, result.mapped_json)
+            render_timings(job.timings)
+
+    # -----------------------------
+    # Batch upload (several PDFs and/or zip files)
+    # -----------------------------
+    if batch_files:
+        batch_signature = (extraction_type, *((f.name, f.size) for f in batch_files))
+        if st.session_state['batch_signature'] != batch_signature:
+            items = expand_uploads([(f.name, f.getvalue()) for f in batch_files])
+            if not items:
+                st.warning("No PDF files found in the upload.")
+            else:
+                for item in items:
+                    item.pdf_hash, _ = upload_store.put(item.data)
+
+                st.info(f"Processing {len(items)} PDF(s) with up to {BATCH_WORKERS} worker(s)...")
+                overall_progress = st.progress(0.0)
+                status_rows = [st.empty() for _ in items]
+                finished: set[int] = set()
+                status_icons = {"queued": "⏸️", "running": "⏳", "cached": "⚡", "done": "✅", "error": "❌"}
+
+                def show_status(idx: int, item) -> None:
+                    detail = f" — {item.error}" if item.error else (f" — {item.seconds:.1f}s" if item.seconds else "")
+                    status_rows[idx].write(f"{status_icons[item.status]} {item.name}: {item.status}{detail}")
+                    if item.status in ("cached", "done", "error"):
+                        finished.add(idx)
+                        overall_progress.progress(len(finished) / len(items))
+
+                for idx, item in enumerate(items):
+                    show_status(idx, item)
+                selection = required_tables() if EXTRACT_MAPPED_TABLES_ONLY and extraction_type == "Tables" else None
+                run_batch(
+                    items,
+                    ExtractionOptions(
+                        extraction_type=extraction_type,
+                        selection=selection,
+                        templates=table_templates,
+                        typed_cells=TYPED_CELLS,
+                    ),
+                    cache=result_cache,
+                    max_workers=BATCH_WORKERS,
+                    on_update=show_status,
+                )
+                overall_progress.empty()
+                for status_row in status_rows:
+                    status_row.empty()
+
+                # One bulk history insert for the whole batch
+                queue_history_records([
+                    (item.name, item.raw_json, item.mapped_json, item.timings, item.pdf_hash)
+                    for item in items if item.ok
+                ])
+                st.session_state['batch_signature'] = batch_signature
+                st.session_state['batch_results'] = [
+                    {
+                        "File": item.name,
+                        "Status": item.status,
+                        "Seconds": round(item.seconds, 2),
+                        "Mapped Keys": len(item.mapped_json or {}),
+                        "Error": item.error or "",
+                    }
+                    for item in items
+                ]
+                st.session_state['batch_zip'] = mapped_zip(items)
+
+        if st.session_state['batch_signature'] == batch_signature and st.session_state['batch_results']:
+            batch_results = st.session_state['batch_results']
+            succeeded = sum(1 for r in batch_results if r["Status"] != "error")
+            st.success(f"Batch finished: {succeeded} / {len(batch_results)} file(s) processed and queued for History.")
+            st.dataframe(pd.DataFrame(batch_results), use_container_width=True)
+            st.download_button(
+                label="📥 Download all Mapped JSON (zip)",
+                data=st.session_state['batch_zip'],
+                file_name="mapped_json.zip",
+                mime="application/zip",
+            )
+
 # -----------------------------
 # History tab
 # -----------------------------
@@ -501,20 +505,23 @@ with tabs[1]:
                 .update({"is_deleted": True}) \
                 .eq("is_deleted", False) \
                 .execute()
+            collect_upload_garbage()
+            st.session_state['history_cursors'] = [None]
             st.success("All records moved to deleted state.")
             st.rerun()
 
     # ---------------------------
-    # FETCH ONLY NON-DELETED ROWS
+    # FETCH ONE PAGE OF NON-DELETED ROWS (list columns only)
     # ---------------------------
-    result = (
-        supabase.table("pdf_history")
-        .select("*")
-        .eq("is_deleted", False)
-        .order("uploaded_at", desc=True)
-        .execute()
-    )
-    rows = result.data
+    pending_saves = write_queue.pending_count()
+    failed_saves = write_queue.failed_count()
+    if pending_saves:
+        st.caption(f"⏳ {pending_saves} upload(s) still being saved to history.")
+    if failed_saves:
+        st.warning(f"{failed_saves} upload(s) could not be saved to history after repeated retries.")
+
+    history_cursors = st.session_state['history_cursors']
+    rows, next_cursor = fetch_history_page(supabase, DEFAULT_PAGE_SIZE, history_cursors[-1])
 
     if not rows:
         st.info("No history records available.")
@@ -541,11 +548,10 @@ with tabs[1]:
             # c1, c2, c3, c4, c5, c6, c7 = st.columns([2, 2, 1, 1, 1, 1, 1])
             c1, c2, c3, c4, c5, c6, c7 = st.columns([2, 2, 1, 1, 1, 1, 1])
 
-            # PDF download on clicking filename
-            pdf_path = UPLOAD_DIR / row["filename"]
-            if pdf_path.exists():
-                with open(pdf_path, "rb") as f:
-                    pdf_bytes = f.read()
+            # PDF download on clicking filename (rows from before the upload store keep name-based files)
+            pdf_hash = row.get("pdf_hash")
+            pdf_path = upload_store.locate(pdf_hash) if pdf_hash else UPLOAD_DIR / row["filename"]
+            if pdf_path is not None and pdf_path.exists():
                 # Truncate filename for UI
                 display_name = row["filename"]
                 if len(display_name) > 30:
@@ -553,15 +559,22 @@ with tabs[1]:
                 else:
                     short_name = display_name
 
-                # PDF Download Button with tooltip for full name
-                c1.download_button(
-                    label=short_name,
-                    help=display_name,  # full filename on hover
-                    data=pdf_bytes,
-                    file_name=row["filename"],
-                    mime="application/pdf",
-                    key=f"pdf_{row['id']}"
-                )
+                if st.session_state['history_pdf_download'] == row["id"]:
+                    if pdf_hash:
+                        # Archived uploads move back into the store when downloaded
+                        pdf_path = upload_store.restore(pdf_hash) or pdf_path
+                    # PDF Download Button with tooltip for full name
+                    c1.download_button(
+                        label=f"⬇ {short_name}",
+                        help=display_name,  # full filename on hover
+                        data=pdf_cache.read(pdf_path),
+                        file_name=row["filename"],
+                        mime="application/pdf",
+                        key=f"pdf_{row['id']}"
+                    )
+                elif c1.button(short_name, help=display_name, key=f"load_pdf_{row['id']}"):
+                    st.session_state['history_pdf_download'] = row["id"]
+                    st.rerun()
                 # c1.download_button(
                 #     label=row["filename"],
                 #     data=pdf_bytes,
@@ -585,13 +598,21 @@ with tabs[1]:
             #     key=f"raw_{row['id']}",
             # )
 
-            # MAPPED DOWNLOAD
-            c6.download_button(
-                "⬇",
-                data=json.dumps(row["mapped_json"], ensure_ascii=False),
-                file_name=f"{row['filename'].split('.')[0]}_mapped.json",
-                key=f"mapped_{row['id']}",
-            )
+            # MAPPED DOWNLOAD (JSON is fetched only when requested)
+            mapped_download = st.session_state['history_mapped_download']
+            if mapped_download and mapped_download[0] == row["id"]:
+                c6.download_button(
+                    "⬇",
+                    data=mapped_download[1],
+                    file_name=f"{row['filename'].split('.')[0]}_mapped.json",
+                    key=f"mapped_{row['id']}",
+                )
+            elif c6.button("📄", key=f"load_mapped_{row['id']}", help="Fetch mapped JSON for download"):
+                mapped_json = fetch_record_json(supabase, row["id"], "mapped_json")
+                st.session_state['history_mapped_download'] = (
+                    row["id"], dumps(mapped_json)
+                )
+                st.rerun()
 
             # DELETE ROW (SOFT DELETE)
             if c7.button("❌", key=f"del_{row['id']}"):
@@ -599,7 +620,24 @@ with tabs[1]:
                     .update({"is_deleted": True}) \
                     .eq("id", row["id"]) \
                     .execute()
+                if pdf_hash and not pdf_hash_in_use(supabase, pdf_hash):
+                    upload_store.release(pdf_hash)
                 st.success("Deleted successfully.")
                 st.rerun()
 
         st.write("---")
+
+    # ---------------------------
+    # PAGINATION
+    # ---------------------------
+    prev_col, page_col, next_col = st.columns([1, 6, 1])
+    with prev_col:
+        if len(history_cursors) > 1 and st.button("◀ Newer"):
+            history_cursors.pop()
+            st.rerun()
+    with page_col:
+        st.caption(f"Page {len(history_cursors)}")
+    with next_col:
+        if next_cursor is not None and st.button("Older ▶"):
+            history_cursors.append(next_cursor)
+            st.rerun()
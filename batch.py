@@ -0,0 +1,165 @@
+# batch.py
+"""Batch extraction of many PDFs (or zips of PDFs) with a bounded process pool.
+
+Each file goes through the same result cache, extractor and mapping as a
+single upload. Cache hits are answered in the calling process; misses are
+spread over a process pool, and ``on_update`` is called in the caller's
+thread as each file finishes so a UI can show per-file progress.
+"""
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Any, Callable, Optional
+
+from extractor import ExtractionOptions, extract_document
+from mapping_v1 import new_cell_index, run_mapping
+from profiling import StageProfiler
+from result_cache import ResultCache, cache_variant
+from serialization import dumps
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@dataclass
+class BatchItem:
+    name: str
+    data: bytes = field(repr=False)
+    pdf_hash: Optional[str] = None   # set once the upload store has saved ``data``
+    status: str = "queued"          # queued, running, cached, done, error
+    raw_json: Optional[dict[str, Any]] = field(default=None, repr=False)
+    mapped_json: Optional[dict[str, Any]] = field(default=None, repr=False)
+    timings: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("cached", "done")
+
+
+def expand_uploads(files: list[tuple[str, bytes]]) -> list[BatchItem]:
+    """Turn uploaded ``(name, bytes)`` pairs into batch items, unpacking PDFs from zip files."""
+    items = []
+    for name, data in files:
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    member = PurePosixPath(info.filename)
+                    if info.is_dir() or member.suffix.lower() != ".pdf" or member.name.startswith("."):
+                        continue
+                    items.append(BatchItem(name=member.name, data=archive.read(info)))
+        elif name.lower().endswith(".pdf"):
+            items.append(BatchItem(name=name, data=data))
+    return items
+
+
+def _extract_and_map(name: str, data: bytes, options: ExtractionOptions) -> dict[str, Any]:
+    """Process-pool worker: extract and map one PDF; never raises."""
+    started = time.perf_counter()
+    profiler = StageProfiler()
+    cell_index = new_cell_index()
+    try:
+        raw_json = extract_document(data, ExtractionOptions(
+            extraction_type=options.extraction_type,
+            filename=name,
+            selection=options.selection,
+            profiler=profiler,
+            templates=options.templates,
+            typed_cells=options.typed_cells,
+            cell_index=cell_index,
+        ))
+        with profiler.stage("run_mapping"):
+            mapped_json = run_mapping(raw_json, cell_index) or {}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "seconds": time.perf_counter() - started}
+    return {
+        "raw_json": raw_json,
+        "mapped_json": mapped_json,
+        "timings": profiler.to_dict(),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def run_batch(
+    items: list[BatchItem],
+    options: Optional[ExtractionOptions] = None,
+    cache: Optional[ResultCache] = None,
+    max_workers: int = DEFAULT_WORKERS,
+    on_update: Optional[Callable[[int, BatchItem], None]] = None,
+) -> list[BatchItem]:
+    """Process ``items`` in place and return them; ``on_update(index, item)`` fires on every status change."""
+    options = options or ExtractionOptions()
+    variant = cache_variant(options.selection is not None, options.typed_cells, options.extraction_type)
+
+    def notify(idx: int) -> None:
+        if on_update:
+            on_update(idx, items[idx])
+
+    # With a cache, identical uploads (same bytes, any name) are extracted once
+    misses: dict[str, list[int]] = {}
+    for idx, item in enumerate(items):
+        if not cache:
+            key = f"{idx}"
+        else:
+            key = cache.key_for_hash(item.pdf_hash, variant) if item.pdf_hash else cache.key_for(item.data, variant)
+        cached = cache.get(key) if cache else None
+        if cached:
+            item.raw_json, item.mapped_json = cached
+            item.raw_json["metadata"]["filename"] = item.name
+            item.status = "cached"
+            notify(idx)
+        else:
+            misses.setdefault(key, []).append(idx)
+
+    if not misses:
+        return items
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(misses)))) as pool:
+        futures = {}
+        for key, indexes in misses.items():
+            first = items[indexes[0]]
+            futures[pool.submit(_extract_and_map, first.name, first.data, options)] = key
+            for idx in indexes:
+                items[idx].status = "running"
+                notify(idx)
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # worker process died
+                result = {"error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+            if cache and "error" not in result:
+                cache.put(key, result["raw_json"], result["mapped_json"])
+            for idx in misses[key]:
+                item = items[idx]
+                item.seconds = result["seconds"]
+                if "error" in result:
+                    item.status = "error"
+                    item.error = result["error"]
+                else:
+                    raw_json = result["raw_json"]
+                    item.raw_json = {**raw_json, "metadata": {**raw_json["metadata"], "filename": item.name}}
+                    item.mapped_json = result["mapped_json"]
+                    item.timings = result["timings"]
+                    item.status = "done"
+                notify(idx)
+    return items
+
+
+def mapped_zip(items: list[BatchItem]) -> bytes:
+    """Zip every successful item's mapped JSON as ``<stem>_mapped.json``."""
+    buffer = io.BytesIO()
+    used: dict[str, int] = {}
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for item in items:
+            if not item.ok:
+                continue
+            stem = item.name.rsplit(".", 1)[0]
+            # Two uploads can share a name (e.g. from different zip folders)
+            used[stem] = used.get(stem, 0) + 1
+            suffix = f"_{used[stem]}" if used[stem] > 1 else ""
+            archive.writestr(f"{stem}{suffix}_mapped.json", dumps(item.mapped_json))
+    return buffer.getvalue()
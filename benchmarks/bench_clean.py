@@ -0,0 +1,177 @@
+# benchmarks/bench_clean.py
+"""Micro-benchmark: row-by-row vs columnar typing and validation in clean_table_data.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_clean --cols 20 --rows 2000
+"""
+import argparse
+import random
+import timeit
+
+from extractor import clean_table_data, detect_header_row, detect_multirow_headers
+
+
+def _legacy_is_likely_header_row(row) -> bool:
+    if not row:
+        return False
+    non_empty_cells = [cell for cell in row if cell is not None and str(cell).strip()]
+    if len(non_empty_cells) < len(row) * 0.5:
+        return False
+    text_cells = 0
+    short_text_cells = 0
+    for cell in non_empty_cells:
+        cell_str = str(cell).strip()
+        is_number = cell_str.replace('.', '').replace('-', '').replace(',', '').replace('$', '').replace('%', '').isdigit()
+        if not is_number:
+            text_cells += 1
+            if len(cell_str.split()) <= 5:
+                short_text_cells += 1
+    has_mostly_text = text_cells >= len(non_empty_cells) * 0.7 if non_empty_cells else False
+    has_short_text = short_text_cells >= len(non_empty_cells) * 0.6 if non_empty_cells else False
+    return has_mostly_text and has_short_text
+
+
+def _legacy_infer_column_types(data_rows: list[list], num_cols: int) -> list[str]:
+    column_types = ['text'] * num_cols
+    for col_idx in range(num_cols):
+        sample_values = []
+        for row in data_rows[:min(10, len(data_rows))]:
+            if col_idx < len(row) and row[col_idx] is not None:
+                val = str(row[col_idx]).strip()
+                if val:
+                    sample_values.append(val)
+        if not sample_values:
+            continue
+        numeric_count = 0
+        date_count = 0
+        for val in sample_values:
+            clean_val = val.replace(',', '').replace('$', '').replace('%', '').replace(' ', '')
+            if clean_val.replace('.', '').replace('-', '').isdigit():
+                numeric_count += 1
+            elif '/' in val or '-' in val:
+                parts = val.replace('/', '-').split('-')
+                if len(parts) >= 2 and all(p.isdigit() for p in parts):
+                    date_count += 1
+        if numeric_count >= len(sample_values) * 0.7:
+            column_types[col_idx] = 'numeric'
+        elif date_count >= len(sample_values) * 0.7:
+            column_types[col_idx] = 'date'
+    return column_types
+
+
+def legacy_clean_table_data(table: list) -> tuple[list[str], list[list]]:
+    """The previous row-by-row cleaning (without page geometry), kept as the comparison baseline."""
+    header_idx = detect_header_row(table)
+    final_header_idx, raw_headers = detect_multirow_headers(table, header_idx)
+    all_data_rows = table[final_header_idx + 1:] if final_header_idx + 1 < len(table) else []
+    data_rows = [row for row in all_data_rows if row and any(cell is not None and str(cell).strip() for cell in row)]
+    clean_headers = []
+    header_counts: dict[str, int] = {}
+    for i, header in enumerate(raw_headers):
+        if header is None or str(header).strip() == '':
+            clean_header = f"Column_{i+1}"
+        else:
+            clean_header = ' '.join(str(header).strip().replace('\n', ' ').replace('\r', ' ').split())
+        if clean_header in header_counts:
+            header_counts[clean_header] += 1
+            clean_header = f"{clean_header}_{header_counts[clean_header]}"
+        else:
+            header_counts[clean_header] = 1
+        clean_headers.append(clean_header)
+    if not clean_headers:
+        return [], data_rows
+    expected_cols = len(clean_headers)
+    normalized_rows = []
+    for row in data_rows:
+        current_row = list(row)
+        if len(current_row) < expected_cols:
+            current_row = current_row + [None] * (expected_cols - len(current_row))
+        elif len(current_row) > expected_cols:
+            current_row = current_row[:expected_cols]
+        cleaned_row = []
+        for cell in current_row:
+            if cell is None:
+                cleaned_row.append(None)
+            else:
+                cleaned_cell = str(cell).strip()
+                cleaned_cell = cleaned_cell.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+                cleaned_cell = ' '.join(cleaned_cell.split())
+                cleaned_row.append(cleaned_cell if cleaned_cell else None)
+        normalized_rows.append(cleaned_row)
+    if normalized_rows:
+        column_types = _legacy_infer_column_types(normalized_rows, expected_cols)
+        validated_rows = []
+        for row in normalized_rows:
+            if _legacy_is_likely_header_row(row):
+                continue
+            validated_row = []
+            for col_idx in range(expected_cols):
+                cell = row[col_idx]
+                col_type = column_types[col_idx]
+                if cell is None or str(cell).strip() == '':
+                    validated_row.append(cell)
+                    continue
+                cell_str = str(cell).strip()
+                if col_type == 'numeric':
+                    clean_val = cell_str.replace(',', '').replace('$', '').replace('%', '').replace(' ', '')
+                    if not clean_val.replace('.', '').replace('-', '').isdigit():
+                        validated_row.append(None)
+                    else:
+                        validated_row.append(cell)
+                elif col_type == 'date':
+                    parts = cell_str.replace('/', '-').split('-')
+                    if len(parts) >= 2 and all(p.strip().isdigit() for p in parts if p.strip()):
+                        validated_row.append(cell)
+                    else:
+                        validated_row.append(None)
+                else:
+                    validated_row.append(cell)
+            if any(cell is not None and str(cell).strip() for cell in validated_row):
+                validated_rows.append(validated_row)
+        normalized_rows = validated_rows if validated_rows else normalized_rows
+    return clean_headers, normalized_rows
+
+
+def make_table(num_cols: int, num_rows: int, empty_ratio: float, seed: int = 0) -> list[list]:
+    # A long multi-page table: labels, amounts, dates and quantities
+    rnd = random.Random(seed)
+    table = [[f"Heading {col + 1}" for col in range(num_cols)]]
+    for _ in range(num_rows):
+        row = []
+        for col in range(num_cols):
+            if rnd.random() < empty_ratio:
+                row.append(None)
+            elif col % 4 == 0:
+                row.append(f"ITEM {rnd.randint(1, 999)}\nDESCRIPTION")
+            elif col % 4 == 1:
+                row.append(f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2024")
+            else:
+                row.append(f"{rnd.randint(1, 999):,}{rnd.randint(100, 999)}.{rnd.randint(0, 99):02d}")
+        table.append(row)
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cols", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--empty", type=float, default=0.3, help="fraction of empty cells")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    table = make_table(args.cols, args.rows, args.empty)
+    assert legacy_clean_table_data(table) == clean_table_data(table)
+
+    old = min(timeit.repeat(lambda: legacy_clean_table_data(table), number=args.repeat, repeat=3))
+    new = min(timeit.repeat(lambda: clean_table_data(table), number=args.repeat, repeat=3))
+    typed = min(timeit.repeat(lambda: clean_table_data(table, typed=True), number=args.repeat, repeat=3))
+    print(f"table: {args.cols} cols x {args.rows} rows, {args.empty:.0%} empty")
+    print(f"row-by-row           : {old / args.repeat * 1e3:9.2f} ms/table")
+    print(f"columnar (strings)   : {new / args.repeat * 1e3:9.2f} ms/table")
+    print(f"columnar (typed)     : {typed / args.repeat * 1e3:9.2f} ms/table")
+    print(f"speed-up (strings)   : {old / new:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
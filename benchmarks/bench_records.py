@@ -0,0 +1,61 @@
+# benchmarks/bench_records.py
+"""Micro-benchmark: DataFrame round-trip vs build_table_records.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_records --cols 45 --rows 40
+"""
+import argparse
+import random
+import timeit
+
+import pandas as pd
+
+from extractor import build_table_records, filter_null_values
+
+
+def dataframe_records(clean_headers: list[str], normalized_rows: list[list]) -> list[dict]:
+    """The previous table output path, kept here as the comparison baseline."""
+    df = pd.DataFrame(normalized_rows, columns=clean_headers)  # type: ignore
+    return filter_null_values(df.to_dict(orient="records"))
+
+
+def make_table(num_cols: int, num_rows: int, empty_ratio: float, seed: int = 0) -> tuple[list[str], list[list]]:
+    # Wide BE-style tables are mostly empty cells with a few labels and numbers
+    rnd = random.Random(seed)
+    headers = [f"Column_{i + 1}" for i in range(num_cols)]
+    rows = []
+    for _ in range(num_rows):
+        row = []
+        for col in range(num_cols):
+            if rnd.random() < empty_ratio:
+                row.append(None)
+            elif col % 3 == 0:
+                row.append(f"LABEL {rnd.randint(1, 999)}")
+            else:
+                row.append(f"{rnd.randint(1, 999999)}.{rnd.randint(0, 99):02d}")
+        rows.append(row)
+    return headers, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cols", type=int, default=45)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--empty", type=float, default=0.7, help="fraction of empty cells")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    headers, rows = make_table(args.cols, args.rows, args.empty)
+    assert dataframe_records(headers, rows) == build_table_records(headers, rows)
+
+    old = min(timeit.repeat(lambda: dataframe_records(headers, rows), number=args.repeat, repeat=3))
+    new = min(timeit.repeat(lambda: build_table_records(headers, rows), number=args.repeat, repeat=3))
+    print(f"table: {args.cols} cols x {args.rows} rows, {args.empty:.0%} empty")
+    print(f"DataFrame round-trip : {old / args.repeat * 1e6:9.1f} us/table")
+    print(f"build_table_records  : {new / args.repeat * 1e6:9.1f} us/table")
+    print(f"speed-up             : {old / new:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/corpus.py
+"""Deterministic synthetic Bill-of-Entry-like PDFs for benchmarking.
+
+The generator writes PDF operators directly (ruled grids, shaded header
+fills and Helvetica text), so it needs nothing beyond the standard library
+and produces byte-identical files for the same parameters and seed.
+
+    python -m benchmarks.corpus out.pdf --pages 30 --tables 2 --cols 40
+"""
+import argparse
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+PAGE_WIDTH = 842   # A4 landscape, in points
+PAGE_HEIGHT = 595
+MARGIN = 24
+FONT_SIZE = 5
+HEADER_FILL = (0.80, 0.88, 1.00)  # light blue, counts as "highlighted"
+
+_LABELS = ["BE No", "Port Code", "BE Type", "IEC", "GSTIN", "CB Code", "Invoice", "Amount",
+           "Currency", "Country", "Mode", "Status", "Qty", "UQC", "CTH", "Description"]
+
+
+@dataclass
+class CorpusSpec:
+    pages: int = 10
+    tables_per_page: int = 2
+    columns: int = 40
+    rows: int = 20              # data rows per table
+    shaded_headers: bool = True
+    header_rows: int = 2        # >1 produces multi-row headers
+    seed: int = 0
+
+    def name(self) -> str:
+        return (f"p{self.pages}-t{self.tables_per_page}-c{self.columns}-r{self.rows}"
+                f"-h{self.header_rows}{'s' if self.shaded_headers else ''}-seed{self.seed}")
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _cell_text(rnd: random.Random, col: int) -> str:
+    kind = col % 4
+    if kind == 0:
+        return f"{rnd.choice(_LABELS).upper()} {rnd.randint(1, 99)}"
+    if kind == 1:
+        return f"{rnd.randint(1, 999999)}.{rnd.randint(0, 99):02d}"
+    if kind == 2:
+        return f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/20{rnd.randint(10, 25)}"
+    return "" if rnd.random() < 0.5 else str(rnd.randint(1, 9999))
+
+
+def _table_ops(rnd: random.Random, spec: CorpusSpec, x0: float, top: float, width: float, height: float) -> list[str]:
+    ops = []
+    n_rows = spec.header_rows + spec.rows
+    col_w = width / spec.columns
+    row_h = height / n_rows
+    # PDF user space has its origin at the bottom-left
+    y_top = PAGE_HEIGHT - top
+
+    if spec.shaded_headers:
+        r, g, b = HEADER_FILL
+        ops.append(f"{r} {g} {b} rg")
+        ops.append(f"{x0:.2f} {y_top - row_h * spec.header_rows:.2f} {width:.2f} {row_h * spec.header_rows:.2f} re f")
+        ops.append("0 0 0 rg")
+
+    ops.append("0.4 w")
+    for i in range(n_rows + 1):
+        y = y_top - i * row_h
+        ops.append(f"{x0:.2f} {y:.2f} m {x0 + width:.2f} {y:.2f} l S")
+    for j in range(spec.columns + 1):
+        x = x0 + j * col_w
+        ops.append(f"{x:.2f} {y_top:.2f} m {x:.2f} {y_top - height:.2f} l S")
+
+    ops.append("BT")
+    ops.append(f"/F1 {FONT_SIZE} Tf")
+    for i in range(n_rows):
+        for j in range(spec.columns):
+            if i < spec.header_rows:
+                text = f"{_LABELS[j % len(_LABELS)]}" if i == 0 else f"Part {j + 1}"
+            else:
+                text = _cell_text(rnd, j)
+            if not text:
+                continue
+            # Keep text inside the cell so pdfplumber assigns it to the right column
+            max_chars = max(1, int(col_w / (FONT_SIZE * 0.5)) - 1)
+            text = text[:max_chars]
+            tx = x0 + j * col_w + 1
+            ty = y_top - (i + 1) * row_h + (row_h - FONT_SIZE) / 2 + 1
+            ops.append(f"1 0 0 1 {tx:.2f} {ty:.2f} Tm ({_escape(text)}) Tj")
+    ops.append("ET")
+    return ops
+
+
+def build_pdf(spec: CorpusSpec) -> bytes:
+    """Return the bytes of a PDF described by ``spec``."""
+    rnd = random.Random(spec.seed)
+    usable_h = PAGE_HEIGHT - 2 * MARGIN
+    gap = 12
+    table_h = (usable_h - gap * (spec.tables_per_page - 1)) / spec.tables_per_page
+    width = PAGE_WIDTH - 2 * MARGIN
+
+    contents = []
+    for _ in range(spec.pages):
+        ops = []
+        for t in range(spec.tables_per_page):
+            ops.extend(_table_ops(rnd, spec, MARGIN, MARGIN + t * (table_h + gap), width, table_h))
+        contents.append("\n".join(ops).encode("latin-1"))
+
+    # Object numbers: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects: list[bytes] = []
+    page_ids = [4 + 2 * i for i in range(spec.pages)]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {spec.pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for pid, content in zip(page_ids, contents):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def write_pdf(spec: CorpusSpec, path: Path) -> Path:
+    path = Path(path)
+    path.write_bytes(build_pdf(spec))
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic BE-like PDF.")
+    parser.add_argument("output", type=Path)
+    defaults = CorpusSpec()
+    parser.add_argument("--pages", type=int, default=defaults.pages)
+    parser.add_argument("--tables", dest="tables_per_page", type=int, default=defaults.tables_per_page)
+    parser.add_argument("--cols", dest="columns", type=int, default=defaults.columns)
+    parser.add_argument("--rows", type=int, default=defaults.rows)
+    parser.add_argument("--header-rows", type=int, default=defaults.header_rows)
+    parser.add_argument("--no-shading", dest="shaded_headers", action="store_false")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+    spec = CorpusSpec(**{k: v for k, v in vars(args).items() if k in asdict(defaults)})
+    write_pdf(spec, args.output)
+    print(f"wrote {args.output} ({spec.name()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# benchmarks/run.py
+"""Stage-by-stage benchmark of the extraction pipeline on a synthetic corpus.
+
+Runs fully offline (no Streamlit, no Supabase). For each corpus spec the
+PDF is generated in a temporary directory and every stage is timed
+separately: find_tables, extract, clean_table_data (which includes header
+detection and type inference), infer_column_types on its own, record
+building and run_mapping.
+
+    python -m benchmarks.run                          # default scenarios
+    python -m benchmarks.run --pages 60 --cols 45     # a single custom scenario
+    python -m benchmarks.run --save-baseline bench_baseline.json
+    python -m benchmarks.run --compare bench_baseline.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Optional
+
+import pdfplumber
+
+import extractor
+from benchmarks.corpus import CorpusSpec, write_pdf
+from mapping_v1 import run_mapping
+
+STAGES = ["find_tables", "extract", "clean_table_data", "infer_column_types", "build_records", "run_mapping"]
+
+DEFAULT_SCENARIOS = [
+    CorpusSpec(pages=5, tables_per_page=1, columns=12, rows=20, header_rows=1, shaded_headers=False),
+    CorpusSpec(pages=10, tables_per_page=2, columns=40, rows=20, header_rows=2, shaded_headers=True),
+    CorpusSpec(pages=10, tables_per_page=5, columns=8, rows=10, header_rows=1, shaded_headers=True),
+]
+
+
+class _InferTimer:
+    """Wraps the column typing inside clean_table_data so its share is visible."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._original = extractor._column_types
+
+    def __enter__(self):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return self._original(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+        extractor._column_types = timed
+        return self
+
+    def __exit__(self, *exc):
+        extractor._column_types = self._original
+
+
+def run_document(pdf_path: Path) -> dict[str, Any]:
+    """Run the serial pipeline on one PDF and return per-stage seconds and counts."""
+    timings = dict.fromkeys(STAGES, 0.0)
+    counts = {"pages": 0, "tables": 0, "rows": 0, "cells": 0}
+    all_data: dict[str, Any] = {"metadata": {"filename": pdf_path.name}, "pages": []}
+
+    wall_start = time.perf_counter()
+    with _InferTimer() as infer_timer, pdfplumber.open(pdf_path) as pdf:
+        all_data["metadata"]["total_pages"] = len(pdf.pages)
+        for page_num, page in enumerate(pdf.pages, start=1):
+            counts["pages"] += 1
+            start = time.perf_counter()
+            tables = page.find_tables()
+            timings["find_tables"] += time.perf_counter() - start
+            page_data: dict[str, Any] = {"page_number": page_num, "tables": []}
+            page_index = extractor.build_page_index(page) if tables else None
+            for table_idx, table_obj in enumerate(tables):
+                start = time.perf_counter()
+                table = page_index.extract_table(table_obj)
+                timings["extract"] += time.perf_counter() - start
+                if not table:
+                    continue
+                start = time.perf_counter()
+                headers, rows = extractor.clean_table_data(table, page, table_obj, page_index)
+                timings["clean_table_data"] += time.perf_counter() - start
+                if not rows:
+                    continue
+                start = time.perf_counter()
+                records = extractor.build_table_records(headers, rows)
+                timings["build_records"] += time.perf_counter() - start
+                counts["tables"] += 1
+                counts["rows"] += len(records)
+                counts["cells"] += sum(len(record) for record in records)
+                if records:
+                    page_data["tables"].append({"table_number": table_idx + 1, "data": records})
+            page.close()
+            if tables:
+                all_data["pages"].append(page_data)
+        timings["infer_column_types"] = infer_timer.seconds
+
+    start = time.perf_counter()
+    run_mapping(all_data)
+    timings["run_mapping"] = time.perf_counter() - start
+    wall = time.perf_counter() - wall_start
+    return {"wall_seconds": wall, "stages": timings, "counts": counts}
+
+
+def _peak_memory(pdf_path: Path) -> int:
+    # Separate untimed pass: tracemalloc slows allocation-heavy code considerably
+    tracemalloc.start()
+    try:
+        extractor.extract_document(pdf_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_scenario(spec: CorpusSpec, workdir: Path, repeat: int, memory: bool) -> dict[str, Any]:
+    pdf_path = write_pdf(spec, workdir / f"{spec.name()}.pdf")
+    runs = [run_document(pdf_path) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["wall_seconds"])
+    result = {
+        "spec": asdict(spec),
+        "wall_seconds": best["wall_seconds"],
+        "pages_per_second": spec.pages / best["wall_seconds"] if best["wall_seconds"] else 0.0,
+        "stages": best["stages"],
+        "counts": best["counts"],
+    }
+    if memory:
+        result["peak_python_bytes"] = _peak_memory(pdf_path)
+    return result
+
+
+def print_report(results: dict[str, dict[str, Any]]) -> None:
+    for name, result in results.items():
+        counts = result["counts"]
+        print(f"\n{name}")
+        print(f"  {result['wall_seconds']:.3f}s total, {result['pages_per_second']:.2f} pages/s "
+              f"({counts['pages']} pages, {counts['tables']} tables, {counts['rows']} rows, {counts['cells']} cells)")
+        for stage in STAGES:
+            seconds = result["stages"][stage]
+            share = seconds / result["wall_seconds"] * 100 if result["wall_seconds"] else 0.0
+            note = "  (included in clean_table_data)" if stage == "infer_column_types" else ""
+            print(f"  {stage:<20} {seconds * 1000:10.1f} ms {share:5.1f}%{note}")
+        if "peak_python_bytes" in result:
+            print(f"  peak Python memory   {result['peak_python_bytes'] / 1024 / 1024:10.1f} MiB")
+
+
+def compare(results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]], tolerance: float) -> bool:
+    """Print per-stage deltas against ``baseline``; return False if anything regressed past ``tolerance``."""
+    ok = True
+    print(f"\nComparison against baseline (tolerance {tolerance:.0%})")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"  {name}: not in baseline")
+            continue
+        print(f"  {name}")
+        metrics = [("wall_seconds", result["wall_seconds"], base["wall_seconds"])]
+        metrics += [(stage, result["stages"][stage], base["stages"].get(stage, 0.0)) for stage in STAGES]
+        if "peak_python_bytes" in result and "peak_python_bytes" in base:
+            metrics.append(("peak_python_bytes", result["peak_python_bytes"], base["peak_python_bytes"]))
+        for metric, new, old in metrics:
+            if not old:
+                continue
+            change = (new - old) / old
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                ok = False
+            print(f"    {metric:<20} {change:+7.1%}{flag}")
+    return ok
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipeline on synthetic PDFs.")
+    parser.add_argument("--pages", type=int, help="run a single scenario with this many pages")
+    parser.add_argument("--tables", type=int, default=2)
+    parser.add_argument("--cols", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--header-rows", type=int, default=2)
+    parser.add_argument("--no-shading", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; the fastest is reported")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("--save-baseline", type=Path, help="write results as a baseline JSON")
+    parser.add_argument("--compare", type=Path, help="compare against a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    if args.pages:
+        scenarios = [CorpusSpec(pages=args.pages, tables_per_page=args.tables, columns=args.cols, rows=args.rows,
+                                header_rows=args.header_rows, shaded_headers=not args.no_shading, seed=args.seed)]
+    else:
+        scenarios = DEFAULT_SCENARIOS
+
+    results: dict[str, dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in scenarios:
+            results[spec.name()] = run_scenario(spec, Path(tmp), args.repeat, not args.no_memory)
+    print_report(results)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
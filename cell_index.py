@@ -0,0 +1,132 @@
+# cell_index.py
+"""Per-document inverted index of cell text for label-anchored mapping.
+
+Every text cell and column header of the extracted tables is indexed under
+its normalized text, together with its position and the values next to it:
+the next cell of the same record ("right") and the first value further down
+the same column ("below"). A mapping can then ask for "the value right of
+INVOICE NO" with one dictionary lookup, however the row and column numbers
+of that label shift between documents.
+
+Positions use the same coordinates as mapping paths: page = position in
+``pages`` among the pages that have tables (see ``mapping_v1.table_pages``),
+table = position in ``tables``, row = position in ``data`` (-1 for a column
+header), column = record key.
+"""
+from dataclasses import dataclass
+from typing import Any, Iterable, NamedTuple, Optional
+
+DIRECTIONS = ("right", "below")
+
+
+def normalize_label(text: Any) -> str:
+    """Case-insensitive, whitespace-collapsed text without trailing ':' or '.'."""
+    return ' '.join(str(text).split()).casefold().rstrip(':. ')
+
+
+class CellRef(NamedTuple):
+    page: int
+    table: int
+    row: int
+    column: Any
+
+
+class _Entry(NamedTuple):
+    ref: CellRef
+    right: Any
+    below: Any
+
+
+@dataclass(frozen=True)
+class Anchor:
+    label: str
+    direction: str = "right"
+    occurrence: int = 0              # which match, in document order
+    page: Optional[int] = None       # only match labels on this page position
+    table: Optional[int] = None      # ... and this table position
+
+    @classmethod
+    def from_spec(cls, spec: dict[str, Any]) -> "Anchor":
+        direction = spec.get("direction", "right")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Anchor direction must be one of {DIRECTIONS}: {direction!r}")
+        return cls(
+            label=normalize_label(spec["label"]),
+            direction=direction,
+            occurrence=int(spec.get("occurrence", 0)),
+            page=spec.get("page"),
+            table=spec.get("table"),
+        )
+
+
+class CellIndex:
+    def __init__(self):
+        self._entries: dict[str, list[_Entry]] = {}
+        self._pages = 0
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def add_page(self, page_data: dict[str, Any]) -> None:
+        """Index the next entry of ``pages`` (call in page order)."""
+        if "tables" not in page_data:
+            return  # text-only page: not counted, like in mapping positions
+        page = self._pages
+        self._pages += 1
+        for table_pos, table in enumerate(page_data.get("tables", [])):
+            self._add_table(page, table_pos, table.get("data", []))
+
+    def _add_table(self, page: int, table: int, records: list[dict[str, Any]]) -> None:
+        # Walk the rows bottom-up so the next value down each column is known when a cell is reached
+        next_value: dict[Any, Any] = {}
+        rows = []
+        for row in range(len(records) - 1, -1, -1):
+            record = records[row]
+            keys = list(record)
+            cells = []
+            for pos, column in enumerate(keys):
+                value = record[column]
+                if isinstance(value, str):
+                    right = record[keys[pos + 1]] if pos + 1 < len(keys) else None
+                    cells.append((value, CellRef(page, table, row, column), right, next_value.get(column)))
+            rows.append(cells)
+            next_value.update(record)
+        # Entries are stored in document order: headers first, then rows top-down
+        for column in dict.fromkeys(key for record in records for key in record):
+            if isinstance(column, str):
+                self._add(column, CellRef(page, table, -1, column), None, next_value[column])
+        for cells in reversed(rows):
+            for cell in cells:
+                self._add(*cell)
+
+    def _add(self, text: str, ref: CellRef, right: Any, below: Any) -> None:
+        label = normalize_label(text)
+        if label:
+            self._entries.setdefault(label, []).append(_Entry(ref, right, below))
+
+    def find(self, label: str) -> list[CellRef]:
+        """Every position of ``label`` in document order."""
+        return [entry.ref for entry in self._entries.get(normalize_label(label), [])]
+
+    def resolve(self, anchor: Anchor) -> Any:
+        """The value ``anchor.direction`` of the matching label, or None."""
+        entries: Iterable[_Entry] = self._entries.get(anchor.label, ())
+        if anchor.page is not None or anchor.table is not None:
+            entries = [
+                entry for entry in entries
+                if (anchor.page is None or entry.ref.page == anchor.page)
+                and (anchor.table is None or entry.ref.table == anchor.table)
+            ]
+        entries = list(entries)
+        if anchor.occurrence >= len(entries):
+            return None
+        entry = entries[anchor.occurrence]
+        return entry.right if anchor.direction == "right" else entry.below
+
+
+def build_cell_index(document: dict[str, Any]) -> CellIndex:
+    """Index an already extracted document (e.g. raw JSON read back from history)."""
+    index = CellIndex()
+    for page_data in document.get("pages", []):
+        index.add_page(page_data)
+    return index
@@ -0,0 +1,49 @@
+# download_cache.py
+"""Bounded in-memory cache for files served through download buttons.
+
+Files are read only when a download is actually requested and kept in an
+LRU keyed by path, size and mtime, so a re-upload under the same name is
+never served stale. A file is read with one ``read()`` into a single bytes
+object, and Streamlit keeps a reference to that same object for the
+download instead of copying it. The cache lives at module level, which
+Streamlit keeps alive across reruns and sessions of the same server process.
+"""
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Union
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FileBytesCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple[str, int, int], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def read(self, path: Union[str, Path]) -> bytes:
+        stat = os.stat(path)
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        with open(path, "rb") as f:
+            data = f.read()
+        # Files larger than the whole cache are served but not kept
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = data
+                    self._size += len(data)
+                    while self._size > self.max_bytes:
+                        _, evicted = self._entries.popitem(last=False)
+                        self._size -= len(evicted)
+        return data
+
+
+pdf_cache = FileBytesCache()
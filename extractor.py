@@ -0,0 +1,790 @@
+# extractor.py
+"""Headless PDF table extraction engine.
+
+Everything here is importable without Streamlit or Supabase so the same
+pipeline can run from the Streamlit app, the command line or a worker.
+"""
+import argparse
+import io
+import json
+import math
+import mmap
+import re
+import sys
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import IO, Any, Callable, Iterator, Optional
+
+import pandas as pd
+import pdfplumber
+
+from cell_index import CellIndex
+from page_index import PageIndex
+from profiling import NULL_PROFILER, StageProfiler
+from table_templates import TemplateRegistry
+
+# Bump whenever a change alters the extracted JSON, so cached results are invalidated
+EXTRACTOR_VERSION = "2"
+EXTRACTION_TYPES = ("Tables", "Combined", "Text", "Both")
+
+# -----------------------------
+# Table cleaning helpers
+# -----------------------------
+def normalize_color(color) -> tuple:
+    if not color or not isinstance(color, (list, tuple)):
+        return (1.0, 1.0, 1.0)
+    if len(color) == 1:
+        gray = float(color[0])
+        return (gray, gray, gray)
+    elif len(color) == 3:
+        return (float(color[0]), float(color[1]), float(color[2]))
+    elif len(color) == 4:
+        c, m, y, k = float(color[0]), float(color[1]), float(color[2]), float(color[3])
+        r = (1 - c) * (1 - k)
+        g = (1 - m) * (1 - k)
+        b = (1 - y) * (1 - k)
+        return (r, g, b)
+    return (1.0, 1.0, 1.0)
+
+
+def is_highlighted_color(color) -> bool:
+    r, g, b = normalize_color(color)
+    is_white = r > 0.85 and g > 0.85 and b > 0.85
+    is_black = r < 0.15 and g < 0.15 and b < 0.15
+    return not is_white and not is_black
+
+
+def build_page_index(page) -> PageIndex:
+    return PageIndex(page, is_highlighted_color)
+
+
+def detect_header_row_visual(page, table_obj, page_index: Optional[PageIndex] = None) -> int:
+    if not table_obj:
+        return -1
+    try:
+        if page_index is None:
+            page_index = build_page_index(page)
+        view = page_index.table_view(tuple(table_obj.bbox))
+        if view is None or not view.has_rects or not view.has_chars:
+            return -1
+        table_rows = table_obj.rows
+        if not table_rows:
+            return -1
+        row_boundaries = []
+        for row in table_rows[:5]:
+            if row.cells:
+                cells = [c for c in row.cells if c]
+                if cells:
+                    first_cell = cells[0]
+                    if hasattr(first_cell, 'bbox'):
+                        _, row_top, _, row_bottom = first_cell.bbox
+                        row_boundaries.append((row_top, row_bottom))
+                    elif isinstance(first_cell, (list, tuple)) and len(first_cell) >= 4:
+                        row_top = first_cell[1]
+                        row_bottom = first_cell[3]
+                        row_boundaries.append((row_top, row_bottom))
+        if not row_boundaries:
+            return -1
+        row_highlights = view.count_highlights(row_boundaries)
+        for row_idx in sorted(row_highlights.keys()):
+            if row_highlights[row_idx] >= 1:
+                r_top, r_bottom = row_boundaries[row_idx]
+                if view.has_text_between(r_top, r_bottom):
+                    return row_idx
+    except Exception:
+        pass
+    return -1
+
+
+def is_likely_header_row(row) -> bool:
+    if not row:
+        return False
+    non_empty_cells = [cell for cell in row if cell is not None and str(cell).strip()]
+    if len(non_empty_cells) < len(row) * 0.5:
+        return False
+    text_cells = 0
+    short_text_cells = 0
+    for cell in non_empty_cells:
+        cell_str = str(cell).strip()
+        is_number = cell_str.replace('.', '').replace('-', '').replace(',', '').replace('$', '').replace('%', '').isdigit()
+        if not is_number:
+            text_cells += 1
+            if len(cell_str.split()) <= 5:
+                short_text_cells += 1
+    has_mostly_text = text_cells >= len(non_empty_cells) * 0.7 if non_empty_cells else False
+    has_short_text = short_text_cells >= len(non_empty_cells) * 0.6 if non_empty_cells else False
+    return has_mostly_text and has_short_text
+
+
+def detect_multirow_headers(table: list, start_idx: int) -> tuple[int, list[str]]:
+    if start_idx >= len(table):
+        return start_idx, table[start_idx] if start_idx < len(table) else []
+    potential_header_rows = []
+    max_header_rows = min(3, len(table) - start_idx)
+    for i in range(max_header_rows):
+        row = table[start_idx + i]
+        if is_likely_header_row(row):
+            potential_header_rows.append(row)
+        else:
+            break
+    if len(potential_header_rows) <= 1:
+        return start_idx, table[start_idx] if start_idx < len(table) else []
+    num_cols = max(len(row) for row in potential_header_rows)
+    consolidated_headers = []
+    for col_idx in range(num_cols):
+        header_parts = []
+        for row in potential_header_rows:
+            if col_idx < len(row) and row[col_idx] is not None:
+                cell_str = str(row[col_idx]).strip()
+                if cell_str and cell_str not in header_parts:
+                    header_parts.append(cell_str)
+        if header_parts:
+            consolidated_headers.append(' '.join(header_parts))
+        else:
+            consolidated_headers.append(None)
+    return start_idx + len(potential_header_rows) - 1, consolidated_headers
+
+
+def detect_header_row(table: list, page=None, table_obj=None, page_index: Optional[PageIndex] = None) -> int:
+    if not table or len(table) == 0:
+        return 0
+    if page and table_obj:
+        visual_header = detect_header_row_visual(page, table_obj, page_index)
+        if visual_header >= 0 and visual_header < len(table):
+            candidate_row = table[visual_header]
+            if is_likely_header_row(candidate_row):
+                return visual_header
+    max_rows_to_check = min(5, len(table))
+    for idx, row in enumerate(table[:max_rows_to_check]):
+        if is_likely_header_row(row):
+            return idx
+    return 0
+
+
+# ASCII fast paths for the digit checks below. str.isdigit also accepts other
+# Unicode digits, so non-ASCII cells keep using the string-method rules.
+_WS = r'[ \t\n\r\x0b\x0c\x1c-\x1f]'
+_HEADER_NUMBER_RE = re.compile(r'[.\-,$%]*[0-9][0-9.\-,$%]*')
+_NUMBER_RE = re.compile(r'[,$% .\-]*[0-9][0-9,$% .\-]*')
+_DATE_LIKE_RE = re.compile(r'[0-9]+(?:[/-][0-9]+)+')
+_VALID_DATE_RE = re.compile(rf'{_WS}*(?:[0-9]+{_WS}*)?(?:[/-]{_WS}*(?:[0-9]+{_WS}*)?)+')
+
+
+def _is_header_number(value: str) -> bool:
+    # The number test of is_likely_header_row
+    if value.isascii():
+        return _HEADER_NUMBER_RE.fullmatch(value) is not None
+    return value.replace('.', '').replace('-', '').replace(',', '').replace('$', '').replace('%', '').isdigit()
+
+
+def _is_number(value: str) -> bool:
+    if value.isascii():
+        return _NUMBER_RE.fullmatch(value) is not None
+    clean_val = value.replace(',', '').replace('$', '').replace('%', '').replace(' ', '')
+    return clean_val.replace('.', '').replace('-', '').isdigit()
+
+
+def _is_date_like(value: str) -> bool:
+    # Typing rule: every part between '/' or '-' is a number
+    if value.isascii():
+        return _DATE_LIKE_RE.fullmatch(value) is not None
+    if '/' not in value and '-' not in value:
+        return False
+    parts = value.replace('/', '-').split('-')
+    return len(parts) >= 2 and all(p.isdigit() for p in parts)
+
+
+def _is_valid_date(value: str) -> bool:
+    # Validation rule: more lenient than typing (blank parts and padding allowed)
+    if value.isascii():
+        return _VALID_DATE_RE.fullmatch(value) is not None
+    parts = value.replace('/', '-').split('-')
+    return len(parts) >= 2 and all(p.strip().isdigit() for p in parts if p.strip())
+
+
+def infer_column_types(data_rows: list[list], num_cols: int, sample_size: Optional[int] = 10) -> list[str]:
+    """Classify each column as 'numeric', 'date' or 'text' from its first ``sample_size`` rows (None = all)."""
+    sample = data_rows if sample_size is None else data_rows[:sample_size]
+    columns = []
+    for col_idx in range(num_cols):
+        values = []
+        for row in sample:
+            if col_idx < len(row) and row[col_idx] is not None:
+                val = str(row[col_idx]).strip()
+                if val:
+                    values.append(val)
+        columns.append(values)
+    return _column_types(columns, None)
+
+
+def _column_types(columns: list, sample_size: Optional[int]) -> list[str]:
+    """Type each column of cleaned cells (None or stripped, non-empty strings)."""
+    column_types = []
+    for column in columns:
+        values = [cell for cell in (column if sample_size is None else column[:sample_size]) if cell is not None]
+        numeric_count = 0
+        date_count = 0
+        for val in values:
+            if _is_number(val):
+                numeric_count += 1
+            elif _is_date_like(val):
+                date_count += 1
+        if values and numeric_count >= len(values) * 0.7:
+            column_types.append('numeric')
+        elif values and date_count >= len(values) * 0.7:
+            column_types.append('date')
+        else:
+            column_types.append('text')
+    return column_types
+
+
+def _header_like_rows(rows: list[list], num_cols: int) -> list[bool]:
+    """``is_likely_header_row`` for rows of cleaned cells.
+
+    Cells are already stripped and single-spaced, so a cell has at most five
+    words exactly when it has at most four spaces. Rows less than half full
+    are rejected before any cell is inspected.
+    """
+    min_cells = num_cols * 0.5
+    flags = []
+    for row in rows:
+        cells = [cell for cell in row if cell is not None]
+        if not cells or len(cells) < min_cells:
+            flags.append(False)
+            continue
+        text_cells = [cell for cell in cells if not _is_header_number(cell)]
+        if len(text_cells) < len(cells) * 0.7:
+            flags.append(False)
+            continue
+        short_text_cells = sum(1 for cell in text_cells if cell.count(' ') <= 4)
+        flags.append(short_text_cells >= len(cells) * 0.6)
+    return flags
+
+
+# Longest number typed mode converts: a float holds 15 significant digits exactly,
+# and anything longer (account or reference numbers) may not fit in 64 bits
+_MAX_NUMBER_DIGITS = 15
+
+
+def _to_number(value: str):
+    # Percentages and space-separated digit groups are not plain amounts; keep them as written
+    if '%' in value or ' ' in value:
+        return value
+    text = value.replace(',', '').replace('$', '')
+    # Leading zeros usually mark codes (HS codes, IDs); keep those as text
+    digits = text.lstrip('-')
+    if len(digits) > 1 and digits[0] == '0' and digits[1] != '.':
+        return value
+    if sum(char.isdigit() for char in digits) > _MAX_NUMBER_DIGITS:
+        return value
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return value
+
+
+def _to_iso_date(value: str) -> str:
+    parts = [p.strip() for p in value.replace('/', '-').split('-')]
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        return value
+    a, b, c = (int(p) for p in parts)
+    if len(parts[0]) == 4:
+        year, month, day = a, b, c
+    elif len(parts[2]) == 4:
+        # Day first, unless only a month-first reading is a valid date
+        year, month, day = (c, a, b) if b > 12 >= a else (c, b, a)
+    else:
+        return value
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return value
+
+
+def _validate_column(column: tuple, col_type: str, typed: bool) -> list:
+    """Null out cells that do not match their column's type; with ``typed`` also convert them."""
+    if col_type == 'numeric':
+        if typed:
+            return [None if cell is None or not _is_number(cell) else _to_number(cell) for cell in column]
+        return [cell if cell is None or _is_number(cell) else None for cell in column]
+    if col_type == 'date':
+        if typed:
+            return [None if cell is None or not _is_valid_date(cell) else _to_iso_date(cell) for cell in column]
+        return [cell if cell is None or _is_valid_date(cell) else None for cell in column]
+    return column
+
+
+def clean_table_data(
+    table: list,
+    page=None,
+    table_obj=None,
+    page_index: Optional[PageIndex] = None,
+    profiler=NULL_PROFILER,
+    typed: bool = False,
+) -> tuple[list[str], list[list]]:
+    """Return ``(headers, rows)`` for a raw pdfplumber table.
+
+    Cells stay strings by default. With ``typed``, column types are inferred
+    from all rows (not the first 10) and numeric / date cells are emitted as
+    numbers and ISO dates.
+    """
+    if not table or len(table) == 0:
+        return [], []
+    with profiler.stage("header_detection"):
+        header_idx = detect_header_row(table, page, table_obj, page_index)
+        final_header_idx, raw_headers = detect_multirow_headers(table, header_idx)
+    all_data_rows = table[final_header_idx + 1:] if final_header_idx + 1 < len(table) else []
+    data_rows = []
+    for row in all_data_rows:
+        if row and any(cell is not None and str(cell).strip() for cell in row):
+            data_rows.append(row)
+    clean_headers = []
+    header_counts: dict[str, int] = {}
+    for i, header in enumerate(raw_headers):
+        if header is None or str(header).strip() == '':
+            clean_header = f"Column_{i+1}"
+        else:
+            clean_header = str(header).strip()
+            clean_header = clean_header.replace('\n', ' ').replace('\r', ' ')
+            clean_header = ' '.join(clean_header.split())
+        if clean_header in header_counts:
+            header_counts[clean_header] += 1
+            clean_header = f"{clean_header}_{header_counts[clean_header]}"
+        else:
+            header_counts[clean_header] = 1
+        clean_headers.append(clean_header)
+    if not clean_headers:
+        return [], data_rows
+    expected_cols = len(clean_headers)
+    normalized_rows = []
+    for row in data_rows:
+        current_row = list(row)
+        if len(current_row) < expected_cols:
+            current_row = current_row + [None] * (expected_cols - len(current_row))
+        elif len(current_row) > expected_cols:
+            current_row = current_row[:expected_cols]
+        # split() already breaks on newlines, carriage returns and tabs
+        normalized_rows.append([
+            None if cell is None else (' '.join(str(cell).split()) or None) for cell in current_row
+        ])
+    if normalized_rows:
+        # Every row now has expected_cols cells, so types are checked column by column:
+        # text columns are passed through untouched instead of re-checking every cell
+        columns = list(zip(*normalized_rows))
+        column_types = _column_types(columns, None if typed else 10)
+        validated_columns = [
+            _validate_column(column, col_type, typed) for column, col_type in zip(columns, column_types)
+        ]
+        header_like = _header_like_rows(normalized_rows, expected_cols)
+        validated_rows = [
+            list(row)
+            for row, skip in zip(zip(*validated_columns), header_like)
+            if not skip and any(cell is not None for cell in row)
+        ]
+        normalized_rows = validated_rows if validated_rows else normalized_rows
+    return clean_headers, normalized_rows
+
+
+def filter_null_values(data: list[dict]) -> list[dict]:
+    filtered_data = []
+    for record in data:
+        filtered_record = {}
+        for k, v in record.items():
+            if v is None:
+                continue
+            if pd.isna(v):
+                continue
+            if isinstance(v, str) and str(v).strip() == '':
+                continue
+            filtered_record[k] = v
+        if filtered_record:
+            filtered_data.append(filtered_record)
+    return filtered_data
+
+# -----------------------------
+# Extraction pipeline
+# -----------------------------
+@dataclass
+class ExtractionOptions:
+    # "Tables", "Text", "Both" (tables plus the full page text) or
+    # "Combined" (tables plus only the text outside them, in the same pass)
+    extraction_type: str = "Tables"
+    filename: Optional[str] = None   # reported in metadata; defaults to the source name
+    workers: int = 1                 # >1 spreads pages over a process pool
+    # Only extract what a mapping reads: {position in "pages": number of leading tables}.
+    # Positions count pages that have data, exactly as run_mapping indexes them.
+    # None extracts everything; only honoured for "Tables" and always runs serially.
+    selection: Optional[dict[int, int]] = None
+    # Collects per-stage wall time and page/table/row/cell counts when set
+    profiler: Optional[StageProfiler] = None
+    # Reuses table geometry detected on earlier pages with the same ruling layout
+    templates: Optional[TemplateRegistry] = None
+    # Emit numbers and ISO dates for typed columns instead of the original strings
+    typed_cells: bool = False
+    # Filled with every cleaned page, in order, for label-anchored mappings
+    cell_index: Optional[CellIndex] = None
+
+
+def build_table_records(clean_headers: list[str], normalized_rows: list[list]) -> list[dict]:
+    """Zip headers with rows and drop empty cells in a single pass.
+
+    Produces exactly what ``filter_null_values(pd.DataFrame(rows, columns=headers)
+    .to_dict(orient="records"))`` did, without building a DataFrame. Without
+    headers, keys are column positions like the DataFrame's default index.
+    """
+    if clean_headers:
+        headers: list = clean_headers
+    else:
+        headers = list(range(max((len(row) for row in normalized_rows), default=0)))
+    # A duplicated header keeps its first position but takes the last column's value
+    last_index = {header: idx for idx, header in enumerate(headers)}
+    columns = [(header, last_index[header]) for header in dict.fromkeys(headers)]
+    records = []
+    for row in normalized_rows:
+        row_len = len(row)
+        record = {}
+        for header, idx in columns:
+            if idx >= row_len:
+                continue
+            value = row[idx]
+            if value is None or (isinstance(value, str) and not value.strip()):
+                continue
+            record[header] = value
+        if record:
+            records.append(record)
+    return records
+
+
+def extract_page(
+    page, page_num: int, options: ExtractionOptions, max_tables: Optional[int] = None
+) -> Optional[dict[str, Any]]:
+    """Extract one page; ``max_tables`` stops after that many non-empty tables."""
+    profiler = options.profiler or NULL_PROFILER
+    profiler.count("pages")
+    page_data: dict[str, Any] = {"page_number": page_num}
+
+    page_index = None
+    table_bboxes = []
+    if options.extraction_type in ["Tables", "Both", "Combined"]:
+        with profiler.stage("find_tables"):
+            if options.templates is not None:
+                table_settings = options.templates.find_tables(page, profiler)
+            else:
+                table_settings = page.find_tables()
+        if table_settings:
+            page_data["tables"] = []
+            # Built once and shared by every table on the page
+            with profiler.stage("page_index"):
+                page_index = build_page_index(page) if max_tables != 0 else None
+            for table_idx, table_obj in enumerate(table_settings):
+                if max_tables is not None and len(page_data["tables"]) >= max_tables:
+                    break
+                try:
+                    with profiler.stage("extract"):
+                        table = page_index.extract_table(table_obj)
+                    if table and len(table) > 0:
+                        with profiler.stage("clean_table_data"):
+                            clean_headers, normalized_rows = clean_table_data(
+                                table, page, table_obj, page_index, profiler, options.typed_cells
+                            )
+                        if normalized_rows:
+                            with profiler.stage("build_records"):
+                                filtered_data = build_table_records(clean_headers, normalized_rows)
+                            if filtered_data:
+                                page_data["tables"].append({
+                                    "table_number": table_idx + 1,
+                                    "data": filtered_data
+                                })
+                                table_bboxes.append(tuple(table_obj.bbox))
+                                profiler.count("tables")
+                                profiler.count("rows", len(filtered_data))
+                                profiler.count("cells", sum(len(record) for record in filtered_data))
+                except Exception:
+                    pass
+    if options.extraction_type in ["Text", "Both", "Combined"]:
+        with profiler.stage("extract_text"):
+            if options.extraction_type == "Combined" and page_index is not None:
+                # Table chars were already turned into cells; only the rest becomes text
+                text = page_index.text_outside(table_bboxes)
+            else:
+                text = page.extract_text()
+        if text:
+            page_data["text"] = text
+    if len(page_data) > 1:
+        return page_data
+    return None
+
+
+def _source_name(source) -> Optional[str]:
+    name = source if isinstance(source, (str, Path)) else getattr(source, "name", None)
+    return Path(name).name if name else None
+
+
+def open_pdf(source):
+    """Open a path, raw bytes or a binary file-like object with pdfplumber.
+
+    Paths are memory-mapped, so pdfminer's small seeks and reads are served
+    from the OS page cache and the file is never copied into the process.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif isinstance(source, (str, Path)):
+        return _open_mapped(source)
+    return pdfplumber.open(source)
+
+
+def _open_mapped(path) -> pdfplumber.PDF:
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped; let pdfplumber report them
+            return pdfplumber.open(path)
+    try:
+        # Not external: closing the PDF closes the map
+        return pdfplumber.PDF(mapped, path=Path(path), stream_is_external=False)
+    except BaseException:
+        mapped.close()
+        raise
+
+
+def _extract_page_range(
+    source, page_numbers: list[int], options: ExtractionOptions
+) -> tuple[list[dict[str, Any]], Optional[dict[str, Any]]]:
+    """Process-pool worker: open the PDF itself and return the page dicts for ``page_numbers``.
+
+    Also returns the worker's own profile so the parent can merge it.
+    """
+    results = []
+    with open_pdf(source) as pdf:
+        for page_num in page_numbers:
+            page = pdf.pages[page_num - 1]
+            try:
+                page_data = extract_page(page, page_num, options)
+            finally:
+                page.close()
+            if page_data:
+                results.append(page_data)
+    return results, options.profiler.to_dict() if options.profiler else None
+
+
+def _shareable_source(source):
+    """Return something a worker process can reopen: a path or the raw bytes."""
+    if isinstance(source, (str, Path, bytes)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source.read()
+
+
+def _extract_pages_parallel(
+    source,
+    total_pages: int,
+    options: ExtractionOptions,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> list[dict[str, Any]]:
+    source = _shareable_source(source)
+    workers = min(options.workers, total_pages)
+    chunk_size = math.ceil(total_pages / workers)
+    chunks = [
+        list(range(start, min(start + chunk_size, total_pages + 1)))
+        for start in range(1, total_pages + 1, chunk_size)
+    ]
+    # Each worker fills its own profiler; the parent merges them as chunks finish.
+    # The cell index is filled here, in page order, once the chunks are back.
+    worker_options = replace(options, profiler=StageProfiler() if options.profiler else None, cell_index=None)
+    results: dict[int, list[dict[str, Any]]] = {}
+    pages_done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_extract_page_range, source, chunk, worker_options): idx
+            for idx, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            results[idx], worker_profile = future.result()
+            if options.profiler and worker_profile:
+                options.profiler.merge(worker_profile)
+            pages_done += len(chunks[idx])
+            if progress:
+                progress(pages_done, total_pages)
+    # Chunks are contiguous page ranges, so concatenating them in chunk order keeps page order
+    pages = [page_data for idx in range(len(chunks)) for page_data in results[idx]]
+    if options.cell_index is not None:
+        for page_data in pages:
+            options.cell_index.add_page(page_data)
+    return pages
+
+
+def _active_selection(options: ExtractionOptions) -> Optional[dict[int, int]]:
+    if options.extraction_type != "Tables":
+        return None
+    return options.selection
+
+
+def _iter_open_pdf(
+    pdf,
+    options: ExtractionOptions,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[dict[str, Any]]:
+    total_pages = len(pdf.pages)
+    selection = _active_selection(options)
+    position = 0
+    for page_num, page in enumerate(pdf.pages, start=1):
+        max_tables = None
+        if selection is not None:
+            if position > max(selection, default=-1):
+                break
+            max_tables = selection.get(position, 0)
+        if progress:
+            progress(page_num, total_pages)
+        try:
+            page_data = extract_page(page, page_num, options, max_tables)
+        finally:
+            # Drop the parsed layout/objects so memory does not grow with page count
+            page.close()
+        if page_data:
+            position += 1
+            if options.cell_index is not None:
+                options.cell_index.add_page(page_data)
+            yield page_data
+
+
+def iter_pages(
+    source,
+    options: Optional[ExtractionOptions] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield one ``page_data`` dict at a time, in page order.
+
+    Each page's layout and object caches are released as soon as it has been
+    processed, so memory stays flat regardless of the page count.
+    """
+    options = options or ExtractionOptions()
+    with open_pdf(source) as pdf:
+        yield from _iter_open_pdf(pdf, options, progress)
+
+
+def _metadata(source, options: ExtractionOptions, total_pages: int) -> dict[str, Any]:
+    metadata: dict[str, Any] = {
+        "filename": options.filename or _source_name(source),
+        "total_pages": total_pages
+    }
+    if _active_selection(options) is not None:
+        # Only the mapped tables were extracted; re-run without a selection for full raw JSON
+        metadata["partial"] = True
+    if options.typed_cells:
+        metadata["typed_cells"] = True
+    return metadata
+
+
+def write_ndjson(
+    source,
+    fp: IO[str],
+    options: Optional[ExtractionOptions] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """Stream ``source`` to ``fp`` as NDJSON and return the number of page lines.
+
+    The first line is ``{"metadata": {...}}``; every following line is one
+    ``page_data`` dict, written (and flushed) as soon as the page is done.
+    """
+    options = options or ExtractionOptions()
+    count = 0
+    with open_pdf(source) as pdf:
+        metadata = _metadata(source, options, len(pdf.pages))
+        fp.write(json.dumps({"metadata": metadata}, ensure_ascii=False) + "\n")
+        for page_data in _iter_open_pdf(pdf, options, progress):
+            fp.write(json.dumps(page_data, ensure_ascii=False) + "\n")
+            fp.flush()
+            count += 1
+    return count
+
+
+def extract_document(
+    source,
+    options: Optional[ExtractionOptions] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> dict[str, Any]:
+    """Extract every page of ``source`` into the ``all_data`` JSON schema.
+
+    ``progress`` is called with ``(page_num, total_pages)`` as pages are processed.
+    With ``options.workers > 1`` pages are split across a process pool; the
+    result is identical to the serial path.
+    """
+    options = options or ExtractionOptions()
+    with open_pdf(source) as pdf:
+        total_pages = len(pdf.pages)
+        all_data: dict[str, Any] = {
+            "metadata": _metadata(source, options, total_pages),
+            "pages": []
+        }
+        if options.workers <= 1 or total_pages <= 1 or _active_selection(options) is not None:
+            all_data["pages"] = list(_iter_open_pdf(pdf, options, progress))
+            return all_data
+    all_data["pages"] = _extract_pages_parallel(source, total_pages, options, progress)
+    return all_data
+
+
+# -----------------------------
+# Command line entry point
+# -----------------------------
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract tables from a PDF into JSON.")
+    parser.add_argument("pdf", type=Path, help="PDF file to extract")
+    parser.add_argument("-o", "--output", type=Path, help="write JSON here instead of stdout")
+    parser.add_argument("--type", dest="extraction_type", default="Tables",
+                        choices=EXTRACTION_TYPES, help="what to extract (default: Tables)")
+    parser.add_argument("--mapped", action="store_true", help="emit run_mapping output instead of raw JSON")
+    parser.add_argument("--full", action="store_true",
+                        help="with --mapped, extract every page instead of only the tables the mapping reads")
+    parser.add_argument("--indent", type=int, default=None, help="pretty-print with this indent")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="extract pages with this many processes")
+    parser.add_argument("--ndjson", action="store_true", help="stream one JSON line per page as it is extracted")
+    parser.add_argument("--typed", action="store_true", help="emit numbers and ISO dates for typed columns")
+    parser.add_argument("--templates", type=Path, default=None,
+                        help="reuse table geometry from this template directory (created if missing)")
+    args = parser.parse_args(argv)
+
+    options = ExtractionOptions(
+        extraction_type=args.extraction_type,
+        workers=args.workers,
+        templates=TemplateRegistry(args.templates) if args.templates else None,
+        typed_cells=args.typed,
+    )
+    if args.mapped and not args.full:
+        from mapping_v1 import required_tables
+        options.selection = required_tables()
+    if args.ndjson:
+        if args.mapped:
+            parser.error("--ndjson cannot be combined with --mapped")
+        if args.output:
+            with args.output.open("w", encoding="utf-8") as fp:
+                write_ndjson(args.pdf, fp, options)
+        else:
+            write_ndjson(args.pdf, sys.stdout, options)
+        return 0
+
+    result = extract_document(args.pdf, options)
+    if args.mapped:
+        from mapping_v1 import run_mapping
+        result = run_mapping(result) or {}
+
+    payload = json.dumps(result, indent=args.indent, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(payload, encoding="utf-8")
+    else:
+        sys.stdout.write(payload + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
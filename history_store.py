@@ -0,0 +1,175 @@
+# history_store.py
+"""Read access to the ``pdf_history`` table for the History tab.
+
+The list view only needs a handful of scalar columns, so it never selects
+the ``raw_json``/``mapped_json`` blobs. Pages are fetched with keyset
+pagination on ``(uploaded_at, id)`` (newest first), which stays cheap no
+matter how deep the user pages. The JSON blobs are fetched one record at a
+time, only when a download is requested.
+
+New rows are written through the write-behind queue by
+``enqueue_history_records``, from the app or from a job worker. Each row
+references its PDF in the upload store by ``pdf_hash``.
+"""
+import os
+import tomllib
+from pathlib import Path
+from typing import Any, Optional
+
+from mapping_v1 import MAPPING_VERSION
+from raw_store import BLOB_TABLE, decode_raw_json, encode_raw_json, fetch_blob
+
+HISTORY_TABLE = "pdf_history"
+LIST_COLUMNS = "id,filename,uploaded_at,page_count,table_count,mapped_keys,pdf_hash"
+DEFAULT_PAGE_SIZE = 25
+
+# (uploaded_at, id) of the last row on the previous page
+Cursor = tuple[str, Any]
+# (filename, raw_json, mapped_json, timings, pdf_hash) of one processed document
+HistoryRecord = tuple[str, dict, dict, Optional[dict], Optional[str]]
+
+
+def connect():
+    """Supabase client from SUPABASE_URL / SUPABASE_KEY, or the app's .streamlit/secrets.toml."""
+    from supabase import create_client
+
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    secrets_path = Path(".streamlit") / "secrets.toml"
+    if not (url and key) and secrets_path.exists():
+        secrets = tomllib.loads(secrets_path.read_text(encoding="utf-8"))
+        url, key = secrets.get("SUPABASE_URL"), secrets.get("SUPABASE_KEY")
+    if not (url and key):
+        raise SystemExit("Set SUPABASE_URL and SUPABASE_KEY (or provide .streamlit/secrets.toml)")
+    return create_client(url, key)
+
+
+def _quote(value: Any) -> str:
+    # PostgREST logic-tree values must be double-quoted when they contain reserved characters
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def build_history_row(
+    filename: str,
+    raw_json_hash: str,
+    raw_json: dict[str, Any],
+    mapped_json: dict[str, Any],
+    timings: Optional[dict[str, Any]] = None,
+    pdf_hash: Optional[str] = None,
+) -> dict[str, Any]:
+    """The ``pdf_history`` insert for one processed document (raw JSON lives in the blob store)."""
+    pages = raw_json.get("pages", [])
+    return {
+        "filename": filename,
+        "raw_json_hash": raw_json_hash,
+        "mapped_json": mapped_json,
+        "page_count": len(pages),
+        "table_count": sum(len(p.get("tables", [])) for p in pages),
+        "mapped_keys": len(mapped_json.keys()),
+        "mapping_version": MAPPING_VERSION,
+        "timings": timings,
+        "pdf_hash": pdf_hash,
+        "is_deleted": False
+    }
+
+
+def enqueue_history_records(queue, records: list[HistoryRecord]) -> None:
+    """Queue (filename, raw_json, mapped_json, timings, pdf_hash) records as one bulk history insert."""
+    blobs, rows = [], []
+    for filename, raw_json, mapped_json, timings, pdf_hash in records:
+        # Raw JSON goes to the compressed, content-addressed blob table (once per distinct document)
+        blob = encode_raw_json(raw_json)
+        blobs.append(blob)
+        rows.append(build_history_row(filename, blob["hash"], raw_json, mapped_json, timings, pdf_hash))
+    blob_ids = queue.enqueue_many(blobs, table=BLOB_TABLE, on_conflict="hash")
+    # A history row is only inserted once its blob is stored, and never if the blob cannot be
+    queue.enqueue_many(rows, depends_on=blob_ids)
+
+
+def fetch_history_page(
+    client, page_size: int = DEFAULT_PAGE_SIZE, after: Optional[Cursor] = None
+) -> tuple[list[dict[str, Any]], Optional[Cursor]]:
+    """Return one page of non-deleted rows and the cursor for the next page (None on the last page)."""
+    query = (
+        client.table(HISTORY_TABLE)
+        .select(LIST_COLUMNS)
+        .eq("is_deleted", False)
+    )
+    if after is not None:
+        uploaded_at, row_id = after
+        query = query.or_(
+            f"uploaded_at.lt.{_quote(uploaded_at)},"
+            f"and(uploaded_at.eq.{_quote(uploaded_at)},id.lt.{_quote(row_id)})"
+        )
+    # One extra row tells us whether another page exists
+    rows = (
+        query.order("uploaded_at", desc=True)
+        .order("id", desc=True)
+        .limit(page_size + 1)
+        .execute()
+        .data
+    ) or []
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        return rows, (last["uploaded_at"], last["id"])
+    return rows, None
+
+
+def fetch_record_json(client, record_id: Any, column: str = "mapped_json") -> Any:
+    """Fetch a single JSON column (``mapped_json`` or ``raw_json``) for one record.
+
+    ``raw_json`` is read from the compressed blob store when the row only
+    holds a ``raw_json_hash``; older rows with an inline copy still work.
+    """
+    if column not in ("mapped_json", "raw_json"):
+        raise ValueError(f"Unsupported column: {column}")
+    columns = "filename,raw_json,raw_json_hash" if column == "raw_json" else column
+    rows = (
+        client.table(HISTORY_TABLE)
+        .select(columns)
+        .eq("id", record_id)
+        .limit(1)
+        .execute()
+        .data
+    )
+    if not rows:
+        return None
+    row = rows[0]
+    if column == "raw_json" and row.get("raw_json") is None and row.get("raw_json_hash"):
+        blob = fetch_blob(client, row["raw_json_hash"])
+        return decode_raw_json(blob, row.get("filename")) if blob else None
+    return row[column]
+
+
+def pdf_hash_in_use(client, pdf_hash: str) -> bool:
+    """Whether any non-deleted row still references the uploaded PDF ``pdf_hash``."""
+    rows = (
+        client.table(HISTORY_TABLE)
+        .select("id")
+        .eq("pdf_hash", pdf_hash)
+        .eq("is_deleted", False)
+        .limit(1)
+        .execute()
+        .data
+    )
+    return bool(rows)
+
+
+def live_pdf_hashes(client, page_size: int = 1000) -> set[str]:
+    """Every ``pdf_hash`` referenced by a non-deleted row, read in keyset pages by id."""
+    hashes: set[str] = set()
+    after = None
+    while True:
+        query = (
+            client.table(HISTORY_TABLE)
+            .select("id,pdf_hash")
+            .eq("is_deleted", False)
+            .not_.is_("pdf_hash", "null")
+        )
+        if after is not None:
+            query = query.gt("id", after)
+        rows = query.order("id").limit(page_size).execute().data or []
+        hashes.update(row["pdf_hash"] for row in rows)
+        if len(rows) < page_size:
+            return hashes
+        after = rows[-1]["id"]
@@ -0,0 +1,226 @@
+# jobs.py
+"""Durable extraction jobs in a local SQLite file.
+
+An upload becomes a job row (``queued``); separate worker processes (see
+``worker.py``) claim jobs one at a time, run extraction and mapping, and
+store the result in the row (``done`` or ``error``). The UI only submits
+and polls, so a browser that disconnects and comes back finds the
+finished result instead of starting the extraction again.
+
+Every upload gets its own job (and so its own history record); the job id
+is what a reconnecting page looks up. A worker renews its lease while the
+job runs; a job whose worker died is handed to another worker once the
+lease expires, and the old worker can no longer complete it.
+"""
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from serialization import dumps, loads
+
+JOBS_PATH = Path("queue") / "jobs.sqlite3"
+DEFAULT_LEASE_SECONDS = 600.0
+
+_SCHEMA = """
+create table if not exists jobs (
+    id text primary key,
+    cache_key text not null,
+    filename text not null,
+    pdf_path text not null,
+    options text not null,
+    status text not null default 'queued',
+    attempts integer not null default 0,
+    worker text,
+    error text,
+    timings text,
+    result blob,
+    created_at real not null,
+    started_at real,
+    heartbeat_at real,
+    finished_at real
+)
+"""
+_INDEX = "create index if not exists jobs_status_created on jobs (status, created_at)"
+
+_COLUMNS = "id, cache_key, filename, pdf_path, options, status, attempts, worker, error, timings, created_at, started_at, finished_at"
+
+
+@dataclass
+class Job:
+    id: str
+    cache_key: str
+    filename: str
+    pdf_path: str
+    options: dict[str, Any]
+    status: str                     # queued, running, done, error
+    attempts: int = 0
+    worker: Optional[str] = None
+    error: Optional[str] = None
+    timings: Optional[dict[str, Any]] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+
+@dataclass
+class JobResult:
+    raw_json: dict[str, Any] = field(repr=False)
+    mapped_json: dict[str, Any] = field(repr=False)
+
+
+def _to_job(row: tuple) -> Job:
+    (job_id, cache_key, filename, pdf_path, options, status, attempts,
+     worker, error, timings, created_at, started_at, finished_at) = row
+    return Job(
+        id=job_id,
+        cache_key=cache_key,
+        filename=filename,
+        pdf_path=pdf_path,
+        options=loads(options),
+        status=status,
+        attempts=attempts,
+        worker=worker,
+        error=error,
+        timings=loads(timings) if timings else None,
+        created_at=created_at,
+        started_at=started_at,
+        finished_at=finished_at,
+    )
+
+
+class JobStore:
+    def __init__(
+        self,
+        db_path: Union[str, Path] = JOBS_PATH,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = 3,
+    ):
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute("pragma table_info(jobs)")}
+            if "heartbeat_at" not in columns:
+                # Job files created before leases were renewed
+                conn.execute("alter table jobs add column heartbeat_at real")
+            conn.execute(_INDEX)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Short-lived connections; the UI and every worker process open the same file
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    # -----------------------------
+    # UI side
+    # -----------------------------
+    def submit(self, cache_key: str, filename: str, pdf_path: Union[str, Path], options: dict[str, Any]) -> Job:
+        """Queue a job for ``pdf_path``; the worker stores its result under ``cache_key`` too."""
+        with self._connect() as conn:
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "insert into jobs (id, cache_key, filename, pdf_path, options, created_at) values (?, ?, ?, ?, ?, ?)",
+                (job_id, cache_key, filename, str(Path(pdf_path).resolve()),
+                 dumps(options).decode("utf-8"), time.time()),
+            )
+            row = conn.execute(f"select {_COLUMNS} from jobs where id = ?", (job_id,)).fetchone()
+        return _to_job(row)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute(f"select {_COLUMNS} from jobs where id = ?", (job_id,)).fetchone()
+        return _to_job(row) if row else None
+
+    def result(self, job_id: str) -> Optional[JobResult]:
+        """The stored ``(raw_json, mapped_json)`` of a ``done`` job."""
+        with self._connect() as conn:
+            row = conn.execute("select result from jobs where id = ? and status = 'done'", (job_id,)).fetchone()
+        if not row or row[0] is None:
+            return None
+        payload = loads(row[0])
+        return JobResult(raw_json=payload["raw_json"], mapped_json=payload["mapped_json"])
+
+    def queue_position(self, job: Job) -> int:
+        """Number of queued jobs ahead of ``job``."""
+        with self._connect() as conn:
+            return conn.execute(
+                "select count(*) from jobs where status = 'queued' and created_at < ?", (job.created_at,)
+            ).fetchone()[0]
+
+    # -----------------------------
+    # Worker side
+    # -----------------------------
+    def claim(self, worker: str) -> Optional[Job]:
+        """Atomically take the oldest queued job (or one whose worker's lease expired)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("begin immediate")
+            # Jobs that keep killing their worker are not retried forever
+            conn.execute(
+                "update jobs set status = 'error', error = 'worker lost too many times', finished_at = ? "
+                "where status = 'running' and coalesce(heartbeat_at, started_at) < ? and attempts >= ?",
+                (now, now - self.lease_seconds, self.max_attempts),
+            )
+            row = conn.execute(
+                "select id from jobs where status = 'queued' "
+                "or (status = 'running' and coalesce(heartbeat_at, started_at) < ?) "
+                "order by created_at limit 1",
+                (now - self.lease_seconds,),
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "update jobs set status = 'running', worker = ?, started_at = ?, heartbeat_at = ?, "
+                "attempts = attempts + 1 where id = ?",
+                (worker, now, now, row[0]),
+            )
+            claimed = conn.execute(f"select {_COLUMNS} from jobs where id = ?", (row[0],)).fetchone()
+        return _to_job(claimed)
+
+    def renew(self, job: Job) -> bool:
+        """Extend the lease on a running job; False if this worker no longer holds it."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "update jobs set heartbeat_at = ? where id = ? and worker = ? and status = 'running'",
+                (time.time(), job.id, job.worker),
+            )
+            return cursor.rowcount == 1
+
+    def complete(
+        self, job: Job, raw_json: dict[str, Any], mapped_json: dict[str, Any], timings: Optional[dict[str, Any]] = None
+    ) -> bool:
+        """Store the result; False if the job was reclaimed by another worker (nothing is written)."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "update jobs set status = 'done', result = ?, timings = ?, error = null, finished_at = ? "
+                "where id = ? and worker = ? and status = 'running'",
+                (dumps({"raw_json": raw_json, "mapped_json": mapped_json}),
+                 dumps(timings).decode("utf-8") if timings else None, time.time(), job.id, job.worker),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job: Job, error: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "update jobs set status = 'error', error = ?, finished_at = ? "
+                "where id = ? and worker = ? and status = 'running'",
+                (error[:1000], time.time(), job.id, job.worker),
+            )
+            return cursor.rowcount == 1
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished jobs (and their stored results) older than the given age."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "delete from jobs where status in ('done', 'error') and finished_at < ?",
+                (time.time() - older_than_seconds,),
+            )
+            return cursor.rowcount
@@ -0,0 +1,184 @@
+# mapping_spec.py
+"""Declarative mapping specs compiled into a grouped accessor plan.
+
+A spec is a JSON file under ``mappings/`` that maps each output key to a cell
+of the extracted JSON::
+
+    {
+      "name": "be_v1",
+      "version": "1",
+      "fields": {
+        "BE No.":  {"page": 0, "table": 0, "row": 0, "column": "BE No"},
+        "IEC":     {"page": 0, "table": 0, "row": 1, "column": "BE No",
+                    "fallbacks": [{"page": 0, "table": 0, "row": 2, "column": "BE No"}]}
+      }
+    }
+
+A field may also give a raw ``"path"`` list instead of page/table/row/column,
+or an ``"anchor"`` that finds the value by the label next to it::
+
+    "INVOICE NO": {"anchor": {"label": "INVOICE NO", "direction": "right"},
+                   "fallbacks": [{"page": 0, "table": 1, "row": 33, "column": "Column_21"}]}
+
+Anchors match a cell or column header by normalized text (see
+``cell_index``); ``direction`` is "right" (next cell of the record) or
+"below" (next value down the column), ``occurrence`` picks among repeated
+labels and ``page``/``table`` restrict the search to one position.
+Fallbacks are tried in order when the primary cell is missing.
+
+Compiling turns all paths into a prefix tree, so fields that share a
+page/table/row are resolved in a single descent of the document. Anchors
+are resolved against a per-document ``CellIndex``, one lookup each. Compiled
+plans are cached per spec file and only rebuilt when the file changes.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from cell_index import Anchor, CellIndex, build_cell_index
+
+MAPPINGS_DIR = Path(__file__).resolve().parent / "mappings"
+
+
+@dataclass(frozen=True)
+class _Node:
+    children: tuple[tuple[Any, "_Node"], ...]
+    targets: tuple[tuple[str, int], ...]  # (field, priority) resolved at this node
+
+
+class MappingPlan:
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        fields: tuple[str, ...],
+        root: _Node,
+        anchors: tuple[tuple[str, int, Anchor], ...] = (),
+    ):
+        self.name = name
+        self.version = version
+        self.fields = fields
+        self._root = root
+        self._anchors = anchors  # (field, priority, anchor)
+
+    @property
+    def uses_anchors(self) -> bool:
+        return bool(self._anchors)
+
+    def apply(self, data: Any, cell_index: Optional[CellIndex] = None) -> dict[str, Any]:
+        """Resolve every field against ``data``; unresolved fields map to None.
+
+        Anchored fields use ``cell_index`` when the extractor already built
+        one for ``data``, otherwise an index is built here.
+        """
+        found: dict[str, tuple[int, Any]] = {}
+        if self._anchors:
+            if cell_index is None:
+                cell_index = build_cell_index(data)
+            for field, priority, anchor in self._anchors:
+                value = cell_index.resolve(anchor)
+                if value is not None and (field not in found or priority < found[field][0]):
+                    found[field] = (priority, value)
+        stack = [(self._root, data)]
+        while stack:
+            node, value = stack.pop()
+            if value is not None:
+                for field, priority in node.targets:
+                    if field not in found or priority < found[field][0]:
+                        found[field] = (priority, value)
+            for key, child in node.children:
+                try:
+                    stack.append((child, value[key]))
+                except (LookupError, TypeError):
+                    continue
+        return {field: found[field][1] if field in found else None for field in self.fields}
+
+    def required_tables(self) -> Optional[dict[int, int]]:
+        """Map each page position the plan reads to how many leading tables it needs.
+
+        Pages in between still have to exist, so callers should treat missing
+        positions as needing zero tables. Returns None when the plan reads
+        anything that cannot be narrowed this way (whole pages, text,
+        negative indexes, anchors not restricted to a page and table), meaning
+        the full document is required.
+        """
+        root = self._root
+        if root.targets or any(key != "pages" for key, _ in root.children):
+            return None
+        needed: dict[int, int] = {}
+        for _, _, anchor in self._anchors:
+            if anchor.page is None or anchor.table is None:
+                return None
+            needed[anchor.page] = max(needed.get(anchor.page, 0), anchor.table + 1)
+        for _, pages_node in root.children:
+            if pages_node.targets:
+                return None
+            for page, page_node in pages_node.children:
+                if not isinstance(page, int) or page < 0 or page_node.targets:
+                    return None
+                needed.setdefault(page, 0)
+                for page_key, tables_node in page_node.children:
+                    if page_key == "page_number":
+                        continue
+                    if page_key != "tables" or tables_node.targets:
+                        return None
+                    for table, _ in tables_node.children:
+                        if not isinstance(table, int) or table < 0:
+                            return None
+                        needed[page] = max(needed[page], table + 1)
+        return needed
+
+
+def _field_path(target: dict[str, Any]) -> list[Any]:
+    if "path" in target:
+        return list(target["path"])
+    return ["pages", target["page"], "tables", target.get("table", 0), "data", target["row"], target["column"]]
+
+
+def compile_spec(spec: dict[str, Any]) -> MappingPlan:
+    # Build a mutable trie first, then freeze it into _Node tuples
+    trie: dict[str, Any] = {"children": {}, "targets": []}
+    fields = []
+    anchors = []
+    for field, target in spec["fields"].items():
+        fields.append(field)
+        alternatives = [target] + list(target.get("fallbacks", []))
+        for priority, alternative in enumerate(alternatives):
+            if "anchor" in alternative:
+                anchors.append((field, priority, Anchor.from_spec(alternative["anchor"])))
+                continue
+            node = trie
+            for key in _field_path(alternative):
+                node = node["children"].setdefault(key, {"children": {}, "targets": []})
+            node["targets"].append((field, priority))
+
+    def freeze(node: dict[str, Any]) -> _Node:
+        return _Node(
+            children=tuple((key, freeze(child)) for key, child in node["children"].items()),
+            targets=tuple(node["targets"]),
+        )
+
+    return MappingPlan(
+        spec.get("name", ""), str(spec.get("version", "")), tuple(fields), freeze(trie), tuple(anchors)
+    )
+
+
+@lru_cache(maxsize=32)
+def _load_compiled(path: str, mtime_ns: int) -> MappingPlan:
+    with open(path, "r", encoding="utf-8") as f:
+        return compile_spec(json.load(f))
+
+
+def spec_path(name_or_path: Union[str, Path]) -> Path:
+    path = Path(name_or_path)
+    if path.suffix != ".json":
+        path = MAPPINGS_DIR / f"{name_or_path}.json"
+    return path
+
+
+def load_plan(name_or_path: Union[str, Path]) -> MappingPlan:
+    """Return the compiled plan for a spec name (``"be_v1"``) or a spec file path."""
+    path = spec_path(name_or_path)
+    return _load_compiled(str(path.resolve()), path.stat().st_mtime_ns)
@@ -0,0 +1,2 @@
+-- Per-stage wall time and counts recorded by the upload path (profiling.StageProfiler.to_dict()).
+alter table pdf_history add column if not exists timings jsonb;
@@ -0,0 +1,13 @@
+-- Compressed raw JSON, stored once per distinct document (raw_store.encode_raw_json()).
+create table if not exists pdf_raw_blobs (
+    hash text primary key,            -- sha256 of the canonical JSON (filename removed)
+    codec text not null,              -- 'zstd' or 'gzip'
+    data text not null,               -- base64 of the compressed bytes
+    raw_size integer not null,
+    stored_size integer not null,
+    created_at timestamptz not null default now()
+);
+
+alter table pdf_history add column if not exists raw_json_hash text;
+-- New rows leave raw_json empty and reference pdf_raw_blobs instead.
+alter table pdf_history alter column raw_json drop not null;
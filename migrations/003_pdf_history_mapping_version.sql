@@ -0,0 +1,22 @@
+-- Mapping version each mapped_json was produced with (mapping_v1.MAPPING_VERSION).
+-- Rows written before this column existed are NULL and are re-mapped by remap.py.
+alter table pdf_history add column if not exists mapping_version text;
+
+-- Bulk write-back for remap.py: one call updates many rows, each with its own values.
+create or replace function remap_pdf_history(updates jsonb)
+returns integer
+language sql
+as $$
+    with changed as (
+        update pdf_history h
+           set mapped_json = u.mapped_json,
+               mapped_keys = u.mapped_keys,
+               mapping_version = u.mapping_version
+          -- id is declared with pdf_history.id's type, so the join uses the primary-key index
+          from jsonb_to_recordset(updates)
+               as u(id uuid, mapped_json jsonb, mapped_keys integer, mapping_version text)
+         where h.id = u.id
+        returning 1
+    )
+    select count(*)::integer from changed;
+$$;
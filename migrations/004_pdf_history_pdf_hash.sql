@@ -0,0 +1,8 @@
+-- SHA-256 of the uploaded PDF, stored as uploaded/blobs/<pdf_hash>.pdf (upload_store.UploadStore).
+-- Rows written before this column existed are NULL; their PDF is looked up by filename.
+alter table pdf_history add column if not exists pdf_hash text;
+
+-- Garbage collection asks which hashes live rows still reference.
+create index if not exists pdf_history_live_pdf_hash_idx
+    on pdf_history (pdf_hash)
+    where not is_deleted;
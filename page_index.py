@@ -0,0 +1,179 @@
+# page_index.py
+"""Per-page spatial index over rects and chars.
+
+Every table on a page used to re-filter the page's full object lists:
+header detection cropped the page with ``within_bbox``, and
+``Table.extract()`` scans every char of the page once per table row. A
+``PageIndex`` is built once per page and shared by all of its tables. It
+keeps the coordinates of chars and rects in compact ``array('d')`` columns
+sorted by vertical midpoint, so a table crop or a table row is a bisect
+over a band of the page, and only the objects in that band are looked at.
+The same columns give the page's text outside its tables without a second
+pass over the table chars.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Optional
+
+from pdfplumber import utils
+
+Box = tuple[float, float, float, float]  # (x0, top, x1, bottom)
+
+
+def _within(x0: float, top: float, x1: float, bottom: float, bbox: Box) -> bool:
+    # Same rule as pdfplumber's within_bbox: fully inside and not a zero-size point
+    b_x0, b_top, b_x1, b_bottom = bbox
+    if x0 < b_x0 or top < b_top or x1 > b_x1 or bottom > b_bottom:
+        return False
+    return (x1 - x0) + (bottom - top) > 0
+
+
+class ObjectColumns:
+    """Coordinates of a list of page objects, sorted by vertical midpoint.
+
+    ``order[i]`` is the position of the i-th sorted object in the original
+    list, so callers can get back to the object dicts (and their order).
+    """
+
+    __slots__ = ("x0", "top", "x1", "bottom", "v_mid", "h_mid", "order")
+
+    def __init__(self, objs: list[dict]):
+        boxes = [(o.get('x0', 0), o.get('top', 0), o.get('x1', 0), o.get('bottom', 0)) for o in objs]
+        # Midpoints exactly as pdfplumber's Table.extract computes them
+        v_mids = [(top + bottom) / 2 for _, top, _, bottom in boxes]
+        order = sorted(range(len(boxes)), key=v_mids.__getitem__)
+        self.order = array('l', order)
+        self.x0 = array('d', (boxes[i][0] for i in order))
+        self.top = array('d', (boxes[i][1] for i in order))
+        self.x1 = array('d', (boxes[i][2] for i in order))
+        self.bottom = array('d', (boxes[i][3] for i in order))
+        self.v_mid = array('d', (v_mids[i] for i in order))
+        self.h_mid = array('d', ((boxes[i][0] + boxes[i][2]) / 2 for i in order))
+
+    def band(self, top: float, bottom: float, include_bottom: bool = True) -> range:
+        """Sorted positions whose vertical midpoint lies in [top, bottom] (or [top, bottom))."""
+        hi = bisect_right(self.v_mid, bottom) if include_bottom else bisect_left(self.v_mid, bottom)
+        return range(bisect_left(self.v_mid, top), hi)
+
+    def within(self, bbox: Box) -> list[int]:
+        """Sorted positions of the objects fully inside ``bbox``."""
+        # Anything fully inside bbox has its midpoint inside it too
+        x0, top, x1, bottom = self.x0, self.top, self.x1, self.bottom
+        return [
+            i for i in self.band(bbox[1], bbox[3])
+            if _within(x0[i], top[i], x1[i], bottom[i], bbox)
+        ]
+
+
+class TableView:
+    """The objects of one table bbox, cropped once and sorted for row lookups."""
+
+    def __init__(self, has_rects: bool, highlight_mids: list[float], char_tops: list[float]):
+        self.has_rects = has_rects
+        self.highlight_mids = highlight_mids
+        self.char_tops = char_tops
+
+    @property
+    def has_chars(self) -> bool:
+        return bool(self.char_tops)
+
+    def count_highlights(self, row_boundaries: list[tuple[float, float]]) -> dict[int, int]:
+        """Count highlighted rects per row; a rect belongs to the first row containing its midpoint."""
+        row_highlights: dict[int, int] = {}
+        claimed: set[int] = set()
+        for row_idx, (r_top, r_bottom) in enumerate(row_boundaries):
+            lo = bisect_left(self.highlight_mids, r_top)
+            hi = bisect_right(self.highlight_mids, r_bottom)
+            for i in range(lo, hi):
+                if i not in claimed:
+                    claimed.add(i)
+                    row_highlights[row_idx] = row_highlights.get(row_idx, 0) + 1
+        return row_highlights
+
+    def has_text_between(self, top: float, bottom: float) -> bool:
+        return bisect_left(self.char_tops, top) < bisect_right(self.char_tops, bottom)
+
+
+class PageIndex:
+    def __init__(self, page, is_highlighted: Callable[[object], bool]):
+        self.page_bbox: Box = tuple(page.bbox)  # type: ignore[assignment]
+
+        rects = page.rects
+        self._rects = ObjectColumns(rects)
+        # Only filled, non-white/non-black rects matter for header detection
+        self._rect_highlighted = bytearray(
+            bool(color) and is_highlighted(color)
+            for color in (rects[i].get('non_stroking_color') for i in self._rects.order)
+        )
+
+        self._chars = page.chars
+        self._char_columns = ObjectColumns(self._chars)
+
+    def table_view(self, bbox: Box) -> Optional[TableView]:
+        """Crop the index to ``bbox``; None if the bbox is not a valid region of the page."""
+        x0, top, x1, bottom = bbox
+        p_x0, p_top, p_x1, p_bottom = self.page_bbox
+        if (x1 - x0) * (bottom - top) == 0:
+            return None
+        if x0 < p_x0 or top < p_top or x1 > p_x1 or bottom > p_bottom:
+            return None
+
+        rects = self._rects
+        inside = rects.within(bbox)
+        highlight_mids = sorted(
+            (rects.top[i] + rects.bottom[i]) / 2 for i in inside if self._rect_highlighted[i]
+        )
+        chars = self._char_columns
+        char_tops = sorted(chars.top[i] for i in chars.within(bbox))
+        return TableView(bool(inside), highlight_mids, char_tops)
+
+    def extract_table(self, table) -> list[list[Optional[str]]]:
+        """``table.extract()`` for a table on this page, without scanning every char per row."""
+        chars = self._char_columns
+        table_arr = []
+        for row in table.rows:
+            r_x0, r_top, r_x1, r_bottom = row.bbox
+            # pdfplumber's char_in_bbox: h_mid in [x0, x1) and v_mid in [top, bottom)
+            row_positions = sorted(
+                chars.order[i] for i in chars.band(r_top, r_bottom, include_bottom=False)
+                if r_x0 <= chars.h_mid[i] < r_x1
+            )
+            # Back in page order, as extract_text expects
+            row_chars = [self._chars[i] for i in row_positions]
+            arr = []
+            for cell in row.cells:
+                if cell is None:
+                    arr.append(None)
+                    continue
+                c_x0, c_top, c_x1, c_bottom = cell
+                cell_chars = [
+                    char for char in row_chars
+                    if c_x0 <= (char["x0"] + char["x1"]) / 2 < c_x1
+                    and c_top <= (char["top"] + char["bottom"]) / 2 < c_bottom
+                ]
+                arr.append(utils.extract_text(cell_chars) if cell_chars else "")
+            table_arr.append(arr)
+        return table_arr
+
+    def text_outside(self, bboxes: list[Box]) -> str:
+        """``page.extract_text()`` over the chars that fall in none of ``bboxes``.
+
+        A char belongs to a bbox by the same midpoint rule ``extract_table``
+        uses, so text inside a table is reported there and only there.
+        """
+        chars = self._char_columns
+        excluded: set[int] = set()
+        for x0, top, x1, bottom in bboxes:
+            excluded.update(
+                i for i in chars.band(top, bottom, include_bottom=False)
+                if x0 <= chars.h_mid[i] < x1
+            )
+        positions = sorted(chars.order[i] for i in range(len(chars.order)) if i not in excluded)
+        p_x0, p_top, p_x1, p_bottom = self.page_bbox
+        # Page-level layout defaults of Page.extract_text
+        return utils.extract_text(
+            [self._chars[i] for i in positions],
+            layout_bbox=self.page_bbox,
+            layout_width=p_x1 - p_x0,
+            layout_height=p_bottom - p_top,
+        )
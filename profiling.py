@@ -0,0 +1,69 @@
+# profiling.py
+"""Lightweight wall-time and count instrumentation for the upload path.
+
+    profiler = StageProfiler()
+    with profiler.stage("run_mapping"):
+        mapped = run_mapping(raw)
+    profiler.count("tables", 3)
+    profiler.to_dict()  # {"total_seconds": ..., "stages": {...}, "counts": {...}}
+
+Stages with the same name accumulate, so per-table work (``extract``,
+``clean_table_data``) adds up across a document. ``NULL_PROFILER`` has the
+same interface and does nothing, for callers that did not ask for timings.
+"""
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class StageProfiler:
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def merge(self, other: dict[str, Any]) -> None:
+        """Fold in another profiler's ``to_dict()``, e.g. from a worker process."""
+        for name, seconds in other.get("stages", {}).items():
+            self.add(name, seconds)
+        for name, n in other.get("counts", {}).items():
+            self.count(name, n)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "total_seconds": round(time.perf_counter() - self._started, 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "counts": dict(self.counts),
+        }
+
+
+class _NullProfiler:
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def add(self, name: str, seconds: float) -> None:
+        pass
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def merge(self, other: dict[str, Any]) -> None:
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
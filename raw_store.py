@@ -0,0 +1,99 @@
+# raw_store.py
+"""Compressed, content-addressed storage for extracted raw JSON.
+
+Instead of an uncompressed ``raw_json`` JSONB copy per history row, the raw
+JSON is compressed (zstd when the ``zstandard`` package is installed, gzip
+otherwise) and stored once in ``pdf_raw_blobs`` keyed by the SHA-256 of its
+canonical encoding. ``pdf_history.raw_json_hash`` references the blob.
+
+The upload filename is left out of the stored document, so re-uploads of
+the same PDF under different names share one blob; it is restored from the
+history row when the JSON is read back.
+"""
+import base64
+import gzip
+import hashlib
+from typing import Any, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip is always available
+    zstandard = None
+
+from serialization import dumps, loads
+
+BLOB_TABLE = "pdf_raw_blobs"
+
+
+def _canonical(raw_json: dict[str, Any]) -> bytes:
+    document = dict(raw_json)
+    metadata = dict(document.get("metadata") or {})
+    metadata.pop("filename", None)
+    document["metadata"] = metadata
+    return dumps(document)
+
+
+def _compress(data: bytes) -> tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "gzip", gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed raw JSON")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    raise ValueError(f"Unknown raw JSON codec: {codec}")
+
+
+def encode_raw_json(raw_json: dict[str, Any]) -> dict[str, Any]:
+    """Return the ``pdf_raw_blobs`` row for ``raw_json``; its ``hash`` goes into ``pdf_history``."""
+    canonical = _canonical(raw_json)
+    codec, compressed = _compress(canonical)
+    return {
+        "hash": hashlib.sha256(canonical).hexdigest(),
+        "codec": codec,
+        "data": base64.b64encode(compressed).decode("ascii"),
+        "raw_size": len(canonical),
+        "stored_size": len(compressed),
+    }
+
+
+def decode_raw_json(blob: dict[str, Any], filename: Optional[str] = None) -> dict[str, Any]:
+    document = loads(_decompress(blob["codec"], base64.b64decode(blob["data"])))
+    if filename is not None:
+        # Put the filename back in front, where the extractor writes it
+        document["metadata"] = {"filename": filename, **document.get("metadata", {})}
+    return document
+
+
+def fetch_blob(client, raw_json_hash: str) -> Optional[dict[str, Any]]:
+    rows = (
+        client.table(BLOB_TABLE)
+        .select("codec,data")
+        .eq("hash", raw_json_hash)
+        .limit(1)
+        .execute()
+        .data
+    )
+    return rows[0] if rows else None
+
+
+def fetch_blobs(client, hashes: list[str], chunk_size: int = 100) -> dict[str, dict[str, Any]]:
+    """Fetch many blobs by hash (in URL-sized chunks); returns ``{hash: blob}`` for those found."""
+    unique = list(dict.fromkeys(hashes))
+    blobs: dict[str, dict[str, Any]] = {}
+    for start in range(0, len(unique), chunk_size):
+        rows = (
+            client.table(BLOB_TABLE)
+            .select("hash,codec,data")
+            .in_("hash", unique[start:start + chunk_size])
+            .execute()
+            .data
+        ) or []
+        for row in rows:
+            blobs[row["hash"]] = row
+    return blobs
@@ -0,0 +1,186 @@
+# remap.py
+"""Bulk re-mapping of stored history after a mapping change.
+
+Every non-deleted ``pdf_history`` row whose ``mapping_version`` differs from
+``mapping_v1.MAPPING_VERSION`` gets a fresh ``mapped_json``. The job reads
+the stored raw JSON instead of extracting the PDF again. Rows are read in
+keyset pages by id. Their raw JSON blobs are fetched in bulk, and
+documents that share a blob are mapped once. Each page is written back
+with a single ``remap_pdf_history`` call (migrations/003). The next page
+is fetched while the current one is being mapped.
+
+Progress is checkpointed after every page, so an interrupted run resumes
+after the last page it wrote:
+
+    python remap.py                 # re-map everything that is stale
+    python remap.py --dry-run       # count and map, write nothing
+    python remap.py --restart       # ignore the checkpoint
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from history_store import HISTORY_TABLE, connect
+from mapping_v1 import MAPPING_VERSION, run_mapping
+from raw_store import decode_raw_json, fetch_blobs
+
+CHECKPOINT_PATH = Path("queue") / "remap_checkpoint.json"
+REMAP_FUNCTION = "remap_pdf_history"
+DEFAULT_PAGE_SIZE = 200
+
+
+@dataclass
+class RemapProgress:
+    mapping_version: str
+    last_id: Any = None          # id of the last row of the last page written
+    scanned: int = 0
+    updated: int = 0
+    missing_raw: int = 0         # rows whose raw JSON could not be found
+    failed: int = 0              # rows the mapping raised on
+    finished: bool = False
+
+
+def load_checkpoint(path: Union[str, Path] = CHECKPOINT_PATH) -> Optional[RemapProgress]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return RemapProgress(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def save_checkpoint(progress: RemapProgress, path: Union[str, Path] = CHECKPOINT_PATH) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(asdict(progress), f)
+    os.replace(tmp_path, path)
+
+
+def _fetch_page(client, after: Any, page_size: int) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """One page of stale rows after ``after`` plus the raw JSON blobs they reference."""
+    query = (
+        client.table(HISTORY_TABLE)
+        # raw_json is only set on rows written before the blob store existed
+        .select("id,filename,raw_json_hash,raw_json")
+        .eq("is_deleted", False)
+        .or_(f"mapping_version.is.null,mapping_version.neq.{json.dumps(MAPPING_VERSION)}")
+    )
+    if after is not None:
+        query = query.gt("id", after)
+    rows = query.order("id").limit(page_size).execute().data or []
+    hashes = [row["raw_json_hash"] for row in rows if row.get("raw_json") is None and row.get("raw_json_hash")]
+    return rows, fetch_blobs(client, hashes) if hashes else {}
+
+
+def remap_rows(
+    rows: list[dict[str, Any]], blobs: dict[str, dict[str, Any]], progress: RemapProgress
+) -> list[dict[str, Any]]:
+    """The ``remap_pdf_history`` updates for one page; counts skipped rows in ``progress``."""
+    mapped_by_hash: dict[str, dict[str, Any]] = {}
+    updates = []
+    for row in rows:
+        raw_json_hash = row.get("raw_json_hash")
+        try:
+            if row.get("raw_json") is not None:
+                mapped_json = run_mapping(row["raw_json"]) or {}
+            elif raw_json_hash in mapped_by_hash:
+                mapped_json = mapped_by_hash[raw_json_hash]
+            elif raw_json_hash in blobs:
+                mapped_json = run_mapping(decode_raw_json(blobs[raw_json_hash], row.get("filename"))) or {}
+                mapped_by_hash[raw_json_hash] = mapped_json
+            else:
+                progress.missing_raw += 1
+                continue
+        except Exception:
+            progress.failed += 1
+            continue
+        updates.append({
+            "id": str(row["id"]),
+            "mapped_json": mapped_json,
+            "mapped_keys": len(mapped_json.keys()),
+            "mapping_version": MAPPING_VERSION,
+        })
+    return updates
+
+
+def _write(client, updates: list[dict[str, Any]], attempts: int = 5) -> int:
+    for attempt in range(1, attempts + 1):
+        try:
+            return client.rpc(REMAP_FUNCTION, {"updates": updates}).execute().data or 0
+        except Exception:
+            if attempt == attempts:
+                raise
+            time.sleep(min(30.0, 2 ** attempt))
+    return 0
+
+
+def run_remap(
+    client,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    checkpoint_path: Optional[Union[str, Path]] = CHECKPOINT_PATH,
+    restart: bool = False,
+    dry_run: bool = False,
+    on_page: Optional[Callable[[RemapProgress], None]] = None,
+) -> RemapProgress:
+    """Re-map every stale history row; resumes from ``checkpoint_path`` unless ``restart``."""
+    progress = None
+    if checkpoint_path is not None and not restart:
+        progress = load_checkpoint(checkpoint_path)
+    # A checkpoint written for another mapping version says nothing about this one
+    if progress is None or progress.mapping_version != MAPPING_VERSION or progress.finished:
+        progress = RemapProgress(mapping_version=MAPPING_VERSION)
+
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        pending = prefetch.submit(_fetch_page, client, progress.last_id, page_size)
+        while True:
+            rows, blobs = pending.result()
+            if not rows:
+                break
+            pending = prefetch.submit(_fetch_page, client, rows[-1]["id"], page_size)
+            updates = remap_rows(rows, blobs, progress)
+            if updates and not dry_run:
+                _write(client, updates)
+            progress.scanned += len(rows)
+            progress.updated += len(updates)
+            progress.last_id = rows[-1]["id"]
+            if checkpoint_path is not None and not dry_run:
+                save_checkpoint(progress, checkpoint_path)
+            if on_page:
+                on_page(progress)
+    progress.finished = True
+    if checkpoint_path is not None and not dry_run:
+        save_checkpoint(progress, checkpoint_path)
+    return progress
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-map stored history with the current mapping_v1.")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="rows read and written per batch")
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH, help="resume file")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="map but do not write anything")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    def report(progress: RemapProgress) -> None:
+        rate = progress.scanned / max(time.perf_counter() - started, 1e-9)
+        print(f"scanned {progress.scanned}  updated {progress.updated}  "
+              f"missing {progress.missing_raw}  failed {progress.failed}  ({rate:.0f} rows/s)", flush=True)
+
+    progress = run_remap(
+        connect(), args.page_size, args.checkpoint, restart=args.restart, dry_run=args.dry_run, on_page=report
+    )
+    print(f"done: mapping version {progress.mapping_version}, {progress.updated} rows re-mapped "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# result_cache.py
+"""On-disk cache of extraction + mapping results keyed by PDF content.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus the extractor
+and mapping versions, so re-uploading the same document (under any name)
+skips pdfplumber and run_mapping entirely. The directory is kept under a
+size cap by evicting the least recently used entries.
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+from extractor import EXTRACTOR_VERSION
+from mapping_v1 import MAPPING_VERSION
+from serialization import dumps, loads
+
+CACHE_DIR = Path("cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def version_stamp() -> str:
+    return f"x{EXTRACTOR_VERSION}-m{MAPPING_VERSION}"
+
+
+def cache_variant(partial: bool = False, typed_cells: bool = False, extraction_type: str = "Tables") -> str:
+    """The ``key_for`` variant for extraction modes that change the output for the same bytes."""
+    names = [name for name, enabled in (("partial", partial), ("typed", typed_cells)) if enabled]
+    if extraction_type != "Tables":
+        names.append(extraction_type.lower())
+    return "-".join(names)
+
+
+class ResultCache:
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key_for(self, data: bytes, variant: str = "") -> str:
+        """``variant`` separates results of different extraction modes for the same bytes."""
+        return self.key_for_hash(content_hash(data), variant)
+
+    def key_for_hash(self, digest: str, variant: str = "") -> str:
+        """``key_for`` from an already computed ``content_hash`` (e.g. from ``UploadStore.put``)."""
+        key = f"{digest}-{version_stamp()}"
+        return f"{key}-{variant}" if variant else key
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[tuple[dict[str, Any], dict[str, Any]]]:
+        """Return ``(raw_json, mapped_json)`` for ``key`` or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = loads(f.read())
+        except (OSError, ValueError):
+            return None
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["raw_json"], entry["mapped_json"]
+
+    def put(self, key: str, raw_json: dict[str, Any], mapped_json: dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(dumps({"raw_json": raw_json, "mapped_json": mapped_json}))
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,36 @@
+# serialization.py
+"""One JSON encoding layer for payloads, using orjson when it is installed.
+
+``dumps`` returns compact UTF-8 bytes and is what downloads, the cache, the
+write queue and the blob store use; each payload should be encoded once.
+``dumps_pretty`` is only for text the UI actually shows. Without orjson the
+stdlib ``json`` module produces equivalent output.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+# Header-less tables use integer column keys, which orjson only accepts with OPT_NON_STR_KEYS
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_pretty(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,130 @@
+# table_templates.py
+"""Reuse of detected table geometry for pages with a known layout.
+
+``page.find_tables()`` rebuilds every ruling edge, intersection and cell
+from scratch, and is the most expensive call in extraction. Our documents
+come from a few fixed layouts, so the registry remembers, per layout
+fingerprint, the cell geometry pdfplumber detected the first time and
+rebuilds the ``Table`` objects directly from it on later pages.
+
+The fingerprint is a hash of the page box and of every rect, line and
+curve on the page, i.e. exactly the inputs of the default "lines" table
+strategy. A matching fingerprint therefore always yields the same tables
+as running detection again.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+import pdfplumber
+from pdfplumber.table import Table
+
+from profiling import NULL_PROFILER, StageProfiler
+from serialization import dumps, loads
+
+TEMPLATES_DIR = Path("cache") / "table_templates"
+DEFAULT_MAX_ENTRIES = 10_000
+# Templates kept in memory per process, and how often a put checks the disk cap
+_MEMORY_ENTRIES = 1024
+_EVICT_EVERY = 100
+
+# Cell bounding boxes (x0, top, x1, bottom) of each table on a page
+Geometry = list[list[tuple[float, float, float, float]]]
+
+
+def layout_fingerprint(page) -> str:
+    """Hash of everything the default table finder reads from ``page``."""
+    digest = hashlib.sha256(f"pdfplumber-{pdfplumber.__version__}|{tuple(page.bbox)}".encode())
+    for kind in ("rects", "lines", "curves"):
+        for obj in getattr(page, kind):
+            # Curves are split into edges along their points, not just their bbox
+            points = obj["pts"] if kind == "curves" else ()
+            digest.update(repr((kind, obj["x0"], obj["top"], obj["x1"], obj["bottom"], points)).encode())
+    return digest.hexdigest()
+
+
+class TemplateRegistry:
+    def __init__(self, templates_dir: Path = TEMPLATES_DIR, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.templates_dir = Path(templates_dir)
+        self.max_entries = max_entries
+        self._memory: dict[str, Geometry] = {}
+        self._puts = 0
+        self.templates_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, fingerprint: str) -> Path:
+        return self.templates_dir / f"{fingerprint}.json"
+
+    def get(self, fingerprint: str) -> Optional[Geometry]:
+        geometry = self._memory.get(fingerprint)
+        if geometry is not None:
+            return geometry
+        path = self._path(fingerprint)
+        try:
+            with open(path, "rb") as f:
+                geometry = [[tuple(cell) for cell in table] for table in loads(f.read())["tables"]]
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._remember(fingerprint, geometry)
+        return geometry
+
+    def _remember(self, fingerprint: str, geometry: Geometry) -> None:
+        if len(self._memory) >= _MEMORY_ENTRIES:
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[fingerprint] = geometry
+
+    def put(self, fingerprint: str, geometry: Geometry) -> None:
+        self._remember(fingerprint, geometry)
+        path = self._path(fingerprint)
+        # Write to a temp file and rename so concurrent workers never read a partial template
+        fd, tmp_path = tempfile.mkstemp(dir=self.templates_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumps({"tables": geometry}))
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._puts += 1
+        if self._puts % _EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete the least recently used templates beyond ``max_entries``."""
+        entries = []
+        for path in self.templates_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.max_entries]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def find_tables(self, page, profiler: StageProfiler = NULL_PROFILER) -> list[Any]:
+        """``page.find_tables()``, answered from the registry when the layout is known."""
+        fingerprint = layout_fingerprint(page)
+        geometry = self.get(fingerprint)
+        if geometry is not None:
+            profiler.count("template_hits")
+            return [Table(page, cells) for cells in geometry]
+        tables = page.find_tables()
+        self.put(fingerprint, [[tuple(cell) for cell in table.cells] for table in tables])
+        return tables
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Process-pool workers get the location, not this process's in-memory copy
+        return {**self.__dict__, "_memory": {}}
@@ -0,0 +1,66 @@
+# tests/fake_supabase.py
+"""In-memory stand-in for the parts of the Supabase/PostgREST client the app writes through.
+
+``client.table(name).insert(rows).execute()`` and
+``.upsert(rows, on_conflict=..., ignore_duplicates=True).execute()`` store
+rows in ``tables``; every statement is recorded in ``calls``. Like
+PostgREST, a statement fails as a whole: set ``down`` to fail every
+statement, or ``reject`` to fail any statement containing a matching row.
+"""
+from typing import Any, Callable, Optional
+
+
+class FakeAPIError(Exception):
+    pass
+
+
+class _Statement:
+    def __init__(self, client: "FakeClient", table: str):
+        self._client = client
+        self._table = table
+        self._rows: list[dict[str, Any]] = []
+        self._on_conflict: Optional[str] = None
+        self._op = ""
+
+    def insert(self, rows: list[dict[str, Any]]) -> "_Statement":
+        self._op, self._rows = "insert", list(rows)
+        return self
+
+    def upsert(self, rows: list[dict[str, Any]], on_conflict: str = "", ignore_duplicates: bool = False) -> "_Statement":
+        if not ignore_duplicates:
+            raise NotImplementedError("only ignore_duplicates upserts are used")
+        self._op, self._rows, self._on_conflict = "upsert", list(rows), on_conflict
+        return self
+
+    def execute(self) -> list[dict[str, Any]]:
+        return self._client._execute(self._table, self._op, self._rows, self._on_conflict)
+
+
+class FakeClient:
+    def __init__(self, reject: Callable[[dict[str, Any]], bool] = lambda row: False):
+        self.tables: dict[str, list[dict[str, Any]]] = {}
+        self.calls: list[tuple[str, str, int, Optional[str]]] = []
+        self.down = False
+        self.reject = reject
+
+    def table(self, name: str) -> _Statement:
+        return _Statement(self, name)
+
+    def _execute(self, table: str, op: str, rows: list[dict[str, Any]], on_conflict: Optional[str]) -> list[dict[str, Any]]:
+        self.calls.append((table, op, len(rows), on_conflict))
+        if self.down:
+            raise FakeAPIError("service unavailable")
+        if any(self.reject(row) for row in rows):
+            raise FakeAPIError("row rejected")
+        stored = self.tables.setdefault(table, [])
+        if op == "upsert":
+            keys = {row[on_conflict] for row in stored}
+            written = []
+            for row in rows:
+                if row[on_conflict] not in keys:
+                    keys.add(row[on_conflict])
+                    written.append(row)
+        else:
+            written = rows
+        stored.extend(written)
+        return written
@@ -0,0 +1,105 @@
+# tests/test_jobs.py
+"""Job leases: renewal, reclaiming and completing only while the lease is held."""
+import time
+
+import worker
+from jobs import JobStore
+
+
+class _RecordingQueue:
+    def __init__(self):
+        self.rows = []
+
+    def enqueue_many(self, rows, table="pdf_history", on_conflict=None, depends_on=None):
+        self.rows.extend((table, row) for row in rows)
+        return list(range(len(self.rows) - len(rows), len(self.rows)))
+
+
+class _LockedQueue:
+    def enqueue_many(self, rows, table="pdf_history", on_conflict=None, depends_on=None):
+        raise OSError("database is locked")
+
+
+class _NoCache:
+    def put(self, key, raw_json, mapped_json):
+        raise TypeError("not cacheable")
+
+
+def _submit(store, tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    return store.submit("key", "doc.pdf", pdf, {})
+
+
+def test_complete_reports_lost_lease(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3", lease_seconds=0.05)
+    _submit(store, tmp_path)
+    first = store.claim("a")
+    time.sleep(0.1)
+    second = store.claim("b")
+    assert second.id == first.id
+    assert not store.renew(first)
+    assert not store.complete(first, {}, {})
+    assert store.complete(second, {}, {})
+    assert store.get(first.id).status == "done"
+
+
+def test_renew_keeps_the_job(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3", lease_seconds=0.2)
+    _submit(store, tmp_path)
+    job = store.claim("a")
+    time.sleep(0.15)
+    assert store.renew(job)
+    time.sleep(0.1)
+    assert store.claim("b") is None
+
+
+def test_lost_job_is_not_recorded(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "jobs.sqlite3", lease_seconds=0.05)
+    _submit(store, tmp_path)
+    job = store.claim("a")
+    time.sleep(0.1)
+    store.claim("b")
+    monkeypatch.setattr(worker, "extract_document", lambda path, options: {"doc.pdf": {}})
+    monkeypatch.setattr(worker, "run_mapping", lambda raw_json, cell_index: {})
+    history = _RecordingQueue()
+    worker.process_job(job, store, _NoCache(), history)
+    assert history.rows == []
+    assert store.get(job.id).status == "running"
+
+
+def test_errors_fail_the_job(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    _submit(store, tmp_path)
+    job = store.claim("a")
+
+    def boom(path, options):
+        raise ValueError("bad pdf")
+
+    monkeypatch.setattr(worker, "extract_document", boom)
+    worker.process_job(job, store, _NoCache(), _RecordingQueue())
+    failed = store.get(job.id)
+    assert failed.status == "error" and failed.error == "ValueError: bad pdf"
+
+
+def test_completed_job_is_recorded(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    _submit(store, tmp_path)
+    job = store.claim("a")
+    monkeypatch.setattr(worker, "extract_document", lambda path, options: {"doc.pdf": {}})
+    monkeypatch.setattr(worker, "run_mapping", lambda raw_json, cell_index: {})
+    history = _RecordingQueue()
+    worker.process_job(job, store, _NoCache(), history)
+    assert store.get(job.id).status == "done"
+    assert "pdf_history" in {table for table, _ in history.rows}
+
+
+def test_failed_history_write_fails_the_job(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    _submit(store, tmp_path)
+    job = store.claim("a")
+    monkeypatch.setattr(worker, "extract_document", lambda path, options: {"doc.pdf": {}})
+    monkeypatch.setattr(worker, "run_mapping", lambda raw_json, cell_index: {})
+    worker.process_job(job, store, _NoCache(), _LockedQueue())
+    failed = store.get(job.id)
+    assert failed.status == "error" and failed.error == "OSError: database is locked"
@@ -0,0 +1,34 @@
+# tests/test_typed_cells.py
+"""Typed mode must only convert cells that are plain numbers and fit in JSON."""
+import serialization
+from extractor import _to_number, _validate_column
+
+
+def test_plain_numbers_are_converted():
+    assert _to_number("1,234") == 1234
+    assert _to_number("-$12.50") == -12.5
+    assert _to_number("0.75") == 0.75
+
+
+def test_long_numbers_stay_text():
+    huge = "1" + "0" * 24
+    assert _to_number(huge) == huge
+    assert _to_number("1234567890123456") == "1234567890123456"
+    assert _to_number("123456789012345") == 123456789012345
+    assert _to_number("1234567890.1234567") == "1234567890.1234567"
+
+
+def test_percent_and_spaced_cells_stay_text():
+    assert _to_number("10%") == "10%"
+    assert _to_number("12 34") == "12 34"
+
+
+def test_leading_zero_codes_stay_text():
+    assert _to_number("0042") == "0042"
+
+
+def test_typed_column_serializes():
+    column = ("1" + "0" * 24, "10%", "12 34", "7", None)
+    cells = _validate_column(column, "numeric", typed=True)
+    assert cells == ["1" + "0" * 24, "10%", "12 34", 7, None]
+    assert serialization.loads(serialization.dumps({"cells": cells}))["cells"] == cells
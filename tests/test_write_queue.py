@@ -0,0 +1,98 @@
+# tests/test_write_queue.py
+"""The write-behind queue against an in-memory PostgREST stand-in."""
+import sqlite3
+
+from fake_supabase import FakeClient
+from history_store import enqueue_history_records
+from raw_store import BLOB_TABLE
+from write_queue import WriteBehindQueue
+
+
+def _queue(tmp_path, client, **kwargs):
+    return WriteBehindQueue(client, tmp_path / "queue.sqlite3", **kwargs)
+
+
+def _attempts(queue):
+    with sqlite3.connect(queue.db_path) as conn:
+        return conn.execute("select attempts, next_attempt_at, failed from pending_inserts order by id").fetchall()
+
+
+def test_rows_are_inserted_as_one_batch(tmp_path):
+    client = FakeClient()
+    queue = _queue(tmp_path, client)
+    queue.enqueue_many([{"n": 1}, {"n": 2}, {"n": 3}])
+    assert queue.drain_once() == 3
+    assert client.calls == [("pdf_history", "insert", 3, None)]
+    assert client.tables["pdf_history"] == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert queue.pending_count() == 0
+
+
+def test_failed_batch_falls_back_to_single_rows(tmp_path):
+    client = FakeClient(reject=lambda row: row["n"] == 2)
+    queue = _queue(tmp_path, client)
+    queue.enqueue_many([{"n": 1}, {"n": 2}, {"n": 3}])
+    assert queue.drain_once() == 2
+    assert client.calls == [("pdf_history", "insert", 3, None)] + [("pdf_history", "insert", 1, None)] * 3
+    assert client.tables["pdf_history"] == [{"n": 1}, {"n": 3}]
+    assert queue.pending_count() == 1
+    assert [attempts for attempts, _, _ in _attempts(queue)] == [1]
+
+
+def test_failures_back_off_exponentially(tmp_path):
+    client = FakeClient()
+    client.down = True
+    queue = _queue(tmp_path, client, base_delay=10.0, max_delay=30.0)
+    queue.enqueue({"n": 1})
+    assert queue.drain_once() == 0
+    # The retry is not due yet
+    assert queue.drain_once() == 0
+    assert len(client.calls) == 1
+    for attempts, expected in ((1, 10.0), (2, 20.0), (3, 30.0), (8, 30.0)):
+        for _ in range(20):
+            assert expected / 2 <= queue._backoff(attempts) <= expected
+
+
+def test_rows_are_marked_failed_after_max_attempts(tmp_path):
+    client = FakeClient()
+    client.down = True
+    queue = _queue(tmp_path, client, base_delay=0.0, max_attempts=3)
+    queue.enqueue({"n": 1})
+    for _ in range(5):
+        queue.drain_once()
+    assert len(client.calls) == 3
+    assert queue.pending_count() == 0
+    assert queue.failed_count() == 1
+    assert _attempts(queue)[0][0] == 3
+
+
+def test_upsert_keeps_existing_rows(tmp_path):
+    client = FakeClient()
+    client.tables["pdf_raw_blobs"] = [{"hash": "a", "data": "old"}]
+    queue = _queue(tmp_path, client)
+    queue.enqueue_many([{"hash": "a", "data": "new"}, {"hash": "b", "data": "new"}], table="pdf_raw_blobs", on_conflict="hash")
+    assert queue.drain_once() == 2
+    assert client.calls == [("pdf_raw_blobs", "upsert", 2, "hash")]
+    assert client.tables["pdf_raw_blobs"] == [{"hash": "a", "data": "old"}, {"hash": "b", "data": "new"}]
+
+
+def test_history_row_waits_for_its_blob(tmp_path):
+    client = FakeClient()
+    queue = _queue(tmp_path, client)
+    enqueue_history_records(queue, [("a.pdf", {"pages": []}, {}, None, None)])
+    assert queue.drain_once() == 1
+    assert [table for table, *_ in client.calls] == [BLOB_TABLE]
+    assert queue.drain_once() == 1
+    assert [table for table, *_ in client.calls] == [BLOB_TABLE, "pdf_history"]
+    row = client.tables["pdf_history"][0]
+    assert row["raw_json_hash"] == client.tables[BLOB_TABLE][0]["hash"]
+
+
+def test_history_row_fails_with_its_blob(tmp_path):
+    client = FakeClient(reject=lambda row: "hash" in row)
+    queue = _queue(tmp_path, client, base_delay=0.0, max_attempts=2)
+    enqueue_history_records(queue, [("a.pdf", {"pages": []}, {}, None, None)])
+    for _ in range(4):
+        queue.drain_once()
+    assert "pdf_history" not in client.tables
+    assert queue.pending_count() == 0
+    assert queue.failed_count() == 2
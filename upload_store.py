@@ -0,0 +1,260 @@
+# upload_store.py
+"""Content-addressed store for uploaded PDFs.
+
+Every upload is saved once as ``blobs/<sha256>.pdf``, so two uploads with
+the same bytes share one file and two different files with the same name
+never overwrite each other. History rows reference the blob by its hash
+(``pdf_history.pdf_hash``). The stored blob is the single copy of an upload
+the app works with: extraction, the job workers and History downloads all
+open it by path, and ``extractor.open_pdf`` maps it instead of reading it
+into memory. Saving hashes the upload in the same pass, so the result
+cache key needs no second copy of the bytes either.
+
+Two passes keep the directory bounded:
+
+* ``collect_garbage`` deletes blobs that no live (non-deleted) history row
+  references any more;
+* ``enforce_cap`` moves the least recently used blobs to the archive
+  directory once the store grows past ``max_bytes``; ``restore`` brings an
+  archived blob back when it is downloaded or uploaded again.
+
+Garbage collection skips blobs used within ``grace_seconds``: their
+history row may still be in the write-behind queue. Archiving is undone by
+``restore``, so it only skips blobs used within the last hour (a queued
+job may not have run yet).
+
+    python upload_store.py gc        # delete blobs of deleted history rows
+    python upload_store.py cap       # archive cold blobs beyond the size cap
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterable, Optional, Union
+
+UPLOAD_DIR = Path("uploaded")
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_GRACE_SECONDS = 24 * 3600
+# Blobs used this recently are never archived
+_RECENT_SECONDS = 3600
+_CHUNK_SIZE = 1024 * 1024
+
+
+class _HashingWriter:
+    """File wrapper that hashes everything written through it."""
+
+    def __init__(self, f: IO[bytes]):
+        self._f = f
+        self.digest = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        return self._f.write(data)
+
+
+def _write_hashed(upload: Union[bytes, IO[bytes]], directory: Path) -> tuple[str, str]:
+    """Write ``upload`` to a temp file in ``directory``; return ``(temp path, sha256)``.
+
+    In-memory uploads (Streamlit's ``UploadedFile`` is a ``BytesIO``) are
+    written from a view of their buffer, not from a copy of it.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer = _HashingWriter(f)
+            if isinstance(upload, (bytes, bytearray, memoryview)):
+                writer.write(upload)
+            elif hasattr(upload, "getbuffer"):
+                with upload.getbuffer() as view:
+                    writer.write(view)
+            else:
+                upload.seek(0)
+                shutil.copyfileobj(upload, writer, _CHUNK_SIZE)
+    except BaseException:
+        _unlink(tmp_path)
+        raise
+    return tmp_path, writer.digest.hexdigest()
+
+
+def _unlink(path: Union[str, Path]) -> bool:
+    try:
+        os.unlink(path)
+        return True
+    except OSError:
+        return False
+
+
+@dataclass
+class StoreStats:
+    files: int = 0
+    bytes: int = 0
+
+
+class UploadStore:
+    def __init__(
+        self,
+        root: Union[str, Path] = UPLOAD_DIR,
+        archive_dir: Optional[Union[str, Path]] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        grace_seconds: float = DEFAULT_GRACE_SECONDS,
+    ):
+        self.blobs_dir = Path(root) / "blobs"
+        self.archive_dir = Path(archive_dir) if archive_dir else Path(root) / "archive"
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Path:
+        return self.blobs_dir / f"{digest}.pdf"
+
+    def _archived_path(self, digest: str) -> Path:
+        return self.archive_dir / f"{digest}.pdf"
+
+    def put(self, upload: Union[bytes, IO[bytes]]) -> tuple[str, Path]:
+        """Store ``upload`` under its content hash; return ``(hash, blob path)``."""
+        tmp_path, digest = _write_hashed(upload, self.blobs_dir)
+        path = self.path_for(digest)
+        if path.exists():
+            # Same bytes already stored: keep that file, only mark it as used
+            _unlink(tmp_path)
+            self._touch(path)
+        else:
+            os.replace(tmp_path, path)
+            # A fresh copy makes an archived one redundant
+            _unlink(self._archived_path(digest))
+        self.enforce_cap()
+        return digest, path
+
+    def locate(self, digest: Optional[str]) -> Optional[Path]:
+        """The blob or its archived copy, without moving it (None if neither exists)."""
+        if not digest:
+            return None
+        for path in (self.path_for(digest), self._archived_path(digest)):
+            if path.exists():
+                return path
+        return None
+
+    def restore(self, digest: str) -> Optional[Path]:
+        """The blob path for a download, moving an archived copy back first."""
+        path = self.path_for(digest)
+        if not path.exists():
+            try:
+                shutil.move(self._archived_path(digest), path)
+            except OSError:
+                return None
+        self._touch(path)
+        return path
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        # Recency only matters at the archiving granularity; skipping fresh blobs keeps
+        # their mtime (and so the download cache key) stable across reruns
+        try:
+            if path.stat().st_mtime < time.time() - _RECENT_SECONDS:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _entries(self, directory: Path) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def stats(self) -> dict[str, StoreStats]:
+        result = {}
+        for name, directory in (("blobs", self.blobs_dir), ("archive", self.archive_dir)):
+            entries = self._entries(directory)
+            result[name] = StoreStats(files=len(entries), bytes=sum(size for _, size, _ in entries))
+        return result
+
+    def enforce_cap(self) -> StoreStats:
+        """Archive least recently used blobs until the store fits in ``max_bytes``."""
+        entries = self._entries(self.blobs_dir)
+        total = sum(size for _, size, _ in entries)
+        archived = StoreStats()
+        if total <= self.max_bytes:
+            return archived
+        cutoff = time.time() - min(self.grace_seconds, _RECENT_SECONDS)
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes or mtime >= cutoff:
+                break
+            try:
+                shutil.move(path, self.archive_dir / path.name)
+            except OSError:
+                continue
+            total -= size
+            archived.files += 1
+            archived.bytes += size
+        return archived
+
+    def collect_garbage(self, live_hashes: Iterable[str]) -> StoreStats:
+        """Delete stored and archived blobs whose hash is not in ``live_hashes``."""
+        live = set(live_hashes)
+        cutoff = time.time() - self.grace_seconds
+        deleted = StoreStats()
+        for directory in (self.blobs_dir, self.archive_dir):
+            for mtime, size, path in self._entries(directory):
+                if path.stem in live or mtime >= cutoff:
+                    continue
+                if _unlink(path):
+                    deleted.files += 1
+                    deleted.bytes += size
+        # Temp files left behind by interrupted saves
+        for path in self.blobs_dir.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+        return deleted
+
+    def release(self, digest: Optional[str]) -> bool:
+        """Delete one blob (and any archived copy) that no live history row references any more.
+
+        Blobs used within ``grace_seconds`` are kept, as in ``collect_garbage``.
+        """
+        path = self.locate(digest)
+        try:
+            if path is None or path.stat().st_mtime >= time.time() - self.grace_seconds:
+                return False
+        except OSError:
+            return False
+        removed = _unlink(self.path_for(digest))
+        return _unlink(self._archived_path(digest)) or removed
+
+
+def main() -> None:
+    from history_store import connect, live_pdf_hashes
+
+    parser = argparse.ArgumentParser(description="Maintain the content-addressed upload store.")
+    parser.add_argument("command", choices=["gc", "cap", "stats"])
+    parser.add_argument("--root", type=Path, default=UPLOAD_DIR)
+    parser.add_argument("--archive-dir", type=Path, default=None)
+    parser.add_argument("--max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--grace-hours", type=float, default=DEFAULT_GRACE_SECONDS / 3600)
+    args = parser.parse_args()
+
+    store = UploadStore(args.root, args.archive_dir, args.max_mb * 1024 * 1024, args.grace_hours * 3600)
+    if args.command == "gc":
+        deleted = store.collect_garbage(live_pdf_hashes(connect()))
+        print(f"deleted {deleted.files} blob(s), {deleted.bytes / 1e6:.1f} MB")
+    elif args.command == "cap":
+        archived = store.enforce_cap()
+        print(f"archived {archived.files} blob(s), {archived.bytes / 1e6:.1f} MB")
+    for name, stats in store.stats().items():
+        print(f"{name}: {stats.files} file(s), {stats.bytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# worker.py
+"""Extraction worker processes for the job queue in ``jobs.py``.
+
+Each worker claims one job at a time, extracts and maps the stored PDF,
+and writes the result to the job row and the result cache. The lease on
+the job is renewed while it runs, and the history insert is queued only
+while the worker still holds it, so a worker that lost its job to another
+one does not record it twice. The insert goes into the same write-behind
+queue file the app drains, so the worker itself never talks to Supabase
+and the record is saved even if the user has already closed the page.
+
+    python worker.py                 # one worker
+    python worker.py --processes 3   # three worker processes
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+from extractor import ExtractionOptions, extract_document
+from history_store import enqueue_history_records
+from jobs import JOBS_PATH, Job, JobStore
+from mapping_v1 import new_cell_index, run_mapping
+from profiling import StageProfiler
+from result_cache import ResultCache
+from table_templates import TemplateRegistry
+from write_queue import QUEUE_PATH, WriteBehindQueue
+
+DEFAULT_POLL_INTERVAL = 1.0
+# Finished jobs (and their stored results) are kept this long for reconnecting pages
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+def _options(job: Job) -> ExtractionOptions:
+    selection = job.options.get("selection")
+    return ExtractionOptions(
+        extraction_type=job.options.get("extraction_type", "Tables"),
+        filename=job.filename,
+        # JSON object keys come back as strings
+        selection={int(page): count for page, count in selection.items()} if selection is not None else None,
+        templates=TemplateRegistry() if job.options.get("templates") else None,
+        typed_cells=job.options.get("typed_cells", False),
+        cell_index=new_cell_index(),
+    )
+
+
+class _LeaseRenewal:
+    """Renew the lease on ``job`` from a background thread while the block runs."""
+
+    def __init__(self, store: JobStore, job: Job):
+        self._store = store
+        self._job = job
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        interval = self._store.lease_seconds / 3
+        while not self._stop.wait(interval):
+            try:
+                if not self._store.renew(self._job):
+                    return  # reclaimed by another worker; complete() will refuse this one
+            except Exception:
+                pass  # a locked or briefly unavailable file; try again next interval
+
+    def __enter__(self) -> "_LeaseRenewal":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def process_job(job: Job, store: JobStore, cache: ResultCache, history: WriteBehindQueue) -> None:
+    """Run one claimed job to ``done`` or ``error``; never raises."""
+    profiler = StageProfiler()
+    try:
+        with _LeaseRenewal(store, job):
+            options = _options(job)
+            options.profiler = profiler
+            raw_json = extract_document(job.pdf_path, options)
+            with profiler.stage("run_mapping"):
+                mapped_json = run_mapping(raw_json, options.cell_index) or {}
+        timings = profiler.to_dict()
+        try:
+            cache.put(job.cache_key, raw_json, mapped_json)
+        except Exception:
+            pass  # the job row still holds the result
+        # A fresh lease keeps the job ours until complete(); a failed enqueue
+        # then still fails the job instead of losing its history record
+        if not store.renew(job):
+            return
+        enqueue_history_records(
+            history, [(job.filename, raw_json, mapped_json, timings, job.options.get("pdf_hash"))]
+        )
+        store.complete(job, raw_json, mapped_json, timings)
+    except Exception as e:
+        try:
+            store.fail(job, f"{type(e).__name__}: {e}")
+        except Exception:
+            pass  # the lease expires and another worker retries the job
+
+
+def run_worker(
+    jobs_path=JOBS_PATH,
+    queue_path=QUEUE_PATH,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    parent_pid: Optional[int] = None,
+    once: bool = False,
+) -> None:
+    """Claim and process jobs until interrupted (or, with ``once``, until the queue is empty).
+
+    With ``parent_pid`` the worker exits when that process is gone, so
+    workers spawned by the app do not outlive it.
+    """
+    store = JobStore(jobs_path)
+    store.purge(JOB_RETENTION_SECONDS)
+    cache = ResultCache()
+    # Enqueue only: the app's drain thread performs the inserts
+    history = WriteBehindQueue(None, queue_path)
+    name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while True:
+        if parent_pid is not None and os.getppid() != parent_pid:
+            return
+        job = store.claim(name)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        process_job(job, store, cache, history)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Process queued PDF extraction jobs.")
+    parser.add_argument("-p", "--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_INTERVAL, help="seconds between polls when idle")
+    parser.add_argument("--once", action="store_true", help="exit when no job is queued")
+    parser.add_argument("--parent-pid", type=int, default=None, help="exit when this process exits")
+    args = parser.parse_args()
+
+    kwargs = {"poll_interval": args.poll, "once": args.once}
+    if args.processes <= 1:
+        try:
+            run_worker(parent_pid=args.parent_pid, **kwargs)
+        except KeyboardInterrupt:
+            pass
+        return
+    # Children watch this process; it watches the app (if given)
+    processes = [
+        multiprocessing.Process(target=run_worker, kwargs={**kwargs, "parent_pid": os.getpid()}, daemon=True)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        while any(process.is_alive() for process in processes):
+            if args.parent_pid is not None and os.getppid() != args.parent_pid:
+                break
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# write_queue.py
+"""Durable write-behind queue for Supabase inserts.
+
+The upload path enqueues the history row into a local SQLite file and
+returns immediately; a background thread drains the queue in batches with
+exponential backoff, so a slow or briefly unavailable database no longer
+stalls or fails the upload. Rows survive a process restart and are picked
+up by the next worker. A row can depend on another queued row (a history
+row on its raw JSON blob): it is held back until that row is written, and
+fails with it if that row fails for good.
+
+The client is anything with ``client.table(name).insert(rows).execute()``
+(and ``.upsert(...)`` for rows enqueued with ``on_conflict``), so a local
+stand-in can replace the Supabase client.
+"""
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from serialization import dumps, loads
+
+QUEUE_PATH = Path("queue") / "write_queue.sqlite3"
+
+_SCHEMA = """
+create table if not exists pending_inserts (
+    id integer primary key autoincrement,
+    table_name text not null,
+    on_conflict text,
+    payload text not null,
+    attempts integer not null default 0,
+    next_attempt_at real not null default 0,
+    last_error text,
+    failed integer not null default 0,
+    depends_on integer,
+    created_at real not null
+)
+"""
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        client,
+        db_path: Union[str, Path] = QUEUE_PATH,
+        batch_size: int = 50,
+        poll_interval: float = 1.0,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        max_attempts: int = 10,
+    ):
+        self.client = client
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute("pragma table_info(pending_inserts)")}
+            if "on_conflict" not in columns:  # queue files created before upserts were supported
+                conn.execute("alter table pending_inserts add column on_conflict text")
+            if "depends_on" not in columns:  # ... and before rows could depend on each other
+                conn.execute("alter table pending_inserts add column depends_on integer")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps the queue safe across threads
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    # -----------------------------
+    # Producer side
+    # -----------------------------
+    def enqueue(self, row: dict[str, Any], table: str = "pdf_history", on_conflict: Optional[str] = None) -> int:
+        """Persist ``row`` for a later insert into ``table`` and return its queue id.
+
+        With ``on_conflict`` (a unique column) the row is upserted and an
+        existing row with the same key is left untouched.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "insert into pending_inserts (table_name, on_conflict, payload, created_at) values (?, ?, ?, ?)",
+                (table, on_conflict, dumps(row).decode("utf-8"), time.time()),
+            )
+            queue_id = cursor.lastrowid
+        self._wake.set()
+        return queue_id
+
+    def enqueue_many(
+        self,
+        rows: list[dict[str, Any]],
+        table: str = "pdf_history",
+        on_conflict: Optional[str] = None,
+        depends_on: Optional[list[Optional[int]]] = None,
+    ) -> list[int]:
+        """Queue several rows in one transaction and return their queue ids.
+
+        The drain thread inserts them as one batch. ``depends_on`` gives, per
+        row, the queue id of a row that must be written first (or None).
+        """
+        now = time.time()
+        dependencies = depends_on if depends_on is not None else [None] * len(rows)
+        with self._connect() as conn:
+            queue_ids = [
+                conn.execute(
+                    "insert into pending_inserts (table_name, on_conflict, payload, depends_on, created_at) "
+                    "values (?, ?, ?, ?, ?)",
+                    (table, on_conflict, dumps(row).decode("utf-8"), dependency, now),
+                ).lastrowid
+                for row, dependency in zip(rows, dependencies)
+            ]
+        self._wake.set()
+        return queue_ids
+
+    def pending_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("select count(*) from pending_inserts where failed = 0").fetchone()[0]
+
+    def failed_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("select count(*) from pending_inserts where failed = 1").fetchone()[0]
+
+    # -----------------------------
+    # Consumer side
+    # -----------------------------
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _insert(self, target: tuple[str, Optional[str]], rows: list[dict[str, Any]]) -> None:
+        table, on_conflict = target
+        if on_conflict:
+            self.client.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True).execute()
+        else:
+            self.client.table(table).insert(rows).execute()
+
+    def _record_failure(self, conn: sqlite3.Connection, queue_id: int, attempts: int, error: Exception) -> None:
+        attempts += 1
+        conn.execute(
+            "update pending_inserts set attempts = ?, next_attempt_at = ?, last_error = ?, failed = ? where id = ?",
+            (attempts, time.time() + self._backoff(attempts), repr(error)[:1000],
+             1 if attempts >= self.max_attempts else 0, queue_id),
+        )
+
+    def drain_once(self) -> int:
+        """Insert one batch of due rows per table; return how many rows were written."""
+        with self._connect() as conn:
+            # A row whose dependency failed for good would reference a row that never exists
+            conn.execute(
+                "update pending_inserts set failed = 1, last_error = 'dependency failed' "
+                "where failed = 0 and depends_on in (select id from pending_inserts where failed = 1)"
+            )
+            # Rows wait until the row they depend on has been written (and so removed)
+            due = conn.execute(
+                "select id, table_name, on_conflict, payload, attempts from pending_inserts p "
+                "where failed = 0 and next_attempt_at <= ? "
+                "and (depends_on is null or not exists (select 1 from pending_inserts d where d.id = p.depends_on)) "
+                "order by id limit ?",
+                (time.time(), self.batch_size),
+            ).fetchall()
+        by_target: dict[tuple[str, Optional[str]], list[tuple[int, dict[str, Any], int]]] = {}
+        for queue_id, table, on_conflict, payload, attempts in due:
+            by_target.setdefault((table, on_conflict), []).append((queue_id, loads(payload), attempts))
+
+        written = 0
+        for target, items in by_target.items():
+            try:
+                self._insert(target, [row for _, row, _ in items])
+            except Exception as batch_error:
+                if len(items) == 1:
+                    queue_id, _, attempts = items[0]
+                    with self._connect() as conn:
+                        self._record_failure(conn, queue_id, attempts, batch_error)
+                    continue
+                # Retry one by one so a single bad row cannot hold back the rest of the batch
+                for queue_id, row, attempts in items:
+                    try:
+                        self._insert(target, [row])
+                    except Exception as row_error:
+                        with self._connect() as conn:
+                            self._record_failure(conn, queue_id, attempts, row_error)
+                    else:
+                        with self._connect() as conn:
+                            conn.execute("delete from pending_inserts where id = ?", (queue_id,))
+                        written += 1
+            else:
+                with self._connect() as conn:
+                    conn.executemany("delete from pending_inserts where id = ?", [(queue_id,) for queue_id, _, _ in items])
+                written += len(items)
+        return written
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                written = self.drain_once()
+            except Exception:
+                written = 0
+            if written == 0:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> "WriteBehindQueue":
+        """Start the background drain thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)